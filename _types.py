@@ -6,7 +6,7 @@ from discord.ext import commands
 from typing import TYPE_CHECKING
 
 if TYPE_CHECKING:
-    from warzone_api import WarzoneAPI
+    from warzone_api import AsyncWarzoneAPI
 
 
 from config import Config
@@ -19,7 +19,7 @@ class WarzoneCog(commands.Cog):
         bot: commands.Bot,
         config: Config,
         scheduler: AsyncIOScheduler,
-        warzone_api: "WarzoneAPI",
+        warzone_api: "AsyncWarzoneAPI",
     ):
         pass
 
@@ -106,6 +106,7 @@ class WarzoneGame:
         link="",
         start_time=datetime.now(),
         round=0,
+        title="",
     ) -> None:
         self.outcome: Game.Outcome = outcome
         self.winner: List[int] = []
@@ -113,6 +114,7 @@ class WarzoneGame:
         self.link: str = link
         self.start_time: datetime = start_time
         self.round: int = round
+        self.title: str = title
 
     def __repr__(self) -> str:
         output_str = " vs ".join([str(player) for player in sorted(self.players)])
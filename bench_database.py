@@ -0,0 +1,128 @@
+# Benchmarks the hot RTL queries on a seeded SQLite database, with and without the model indexes.
+# Usage: python3 bench_database.py [players] [games]
+import asyncio
+from datetime import datetime, timedelta
+import os
+import random
+import sys
+import tempfile
+import time
+from typing import Awaitable, Callable, List, Tuple
+
+from tortoise import Tortoise, connections
+from tortoise.expressions import Q
+from tortoise.transactions import in_transaction
+
+from database import RTLGameModel, RTLPlayerModel, init
+
+QUERY_REPEATS = 50
+
+
+async def seed(player_count: int, game_count: int):
+    now = datetime.now()
+    async with in_transaction() as connection:
+        await RTLPlayerModel.bulk_create(
+            [
+                RTLPlayerModel(
+                    warzone_id=i,
+                    name=f"player {i}",
+                    discord_id=10**17 + i,
+                    active=random.random() < 0.05,
+                    in_game=random.random() < 0.5,
+                    elo=random.gauss(1500, 200),
+                )
+                for i in range(player_count)
+            ],
+            batch_size=1000,
+            using_db=connection,
+        )
+        games = []
+        for i in range(game_count):
+            player_a, player_b = random.sample(range(player_count), 2)
+            created = now - timedelta(minutes=game_count - i)
+            # the most recent games are still in progress
+            ended = created + timedelta(minutes=20) if i < game_count - 50 else None
+            games.append(
+                RTLGameModel(
+                    id=i,
+                    created=created,
+                    ended=ended,
+                    template=1540231,
+                    player_a_id=player_a,
+                    player_b_id=player_b,
+                    winner_id=player_a if ended else None,
+                )
+            )
+        await RTLGameModel.bulk_create(games, batch_size=1000, using_db=connection)
+
+
+async def drop_indexes():
+    connection = connections.get("default")
+    _, rows = await connection.execute_query(
+        "SELECT name FROM sqlite_master WHERE type = 'index' AND sql IS NOT NULL"
+    )
+    for row in rows:
+        await connection.execute_script(f'DROP INDEX "{row["name"]}"')
+
+
+def get_queries(
+    player_count: int,
+) -> List[Tuple[str, Callable[[], Awaitable]]]:
+    player_id = random.randrange(player_count)
+    return [
+        (
+            "matchmaking queue",
+            lambda: RTLPlayerModel.filter(active=True, in_game=False).all(),
+        ),
+        (
+            "player by discord id",
+            lambda: RTLPlayerModel.filter(discord_id=10**17 + player_id).first(),
+        ),
+        ("active games", lambda: RTLGameModel.filter(ended=None).all()),
+        (
+            "profile history",
+            lambda: RTLGameModel.filter(
+                Q(player_a_id=player_id) | Q(player_b_id=player_id),
+                ended__not_isnull=True,
+            )
+            .order_by("-ended")
+            .limit(10)
+            .all(),
+        ),
+    ]
+
+
+async def measure(label: str, player_count: int):
+    for name, query in get_queries(player_count):
+        durations = []
+        for _ in range(QUERY_REPEATS):
+            start = time.perf_counter()
+            await query()
+            durations.append(time.perf_counter() - start)
+        durations.sort()
+        print(
+            f"{label:<10} | {name:<20} | median {durations[len(durations) // 2] * 1000:7.2f} ms | max {durations[-1] * 1000:7.2f} ms"
+        )
+
+
+async def main(player_count: int, game_count: int):
+    with tempfile.TemporaryDirectory() as directory:
+        await init(os.path.join(directory, "bench.sqlite3"))
+        try:
+            start = time.perf_counter()
+            await seed(player_count, game_count)
+            print(
+                f"Seeded {player_count} players and {game_count} games in {time.perf_counter() - start:.1f}s"
+            )
+            await measure("indexed", player_count)
+            await drop_indexes()
+            await measure("unindexed", player_count)
+        finally:
+            await Tortoise.close_connections()
+
+
+if __name__ == "__main__":
+    random.seed(18)
+    player_count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    game_count = int(sys.argv[2]) if len(sys.argv) > 2 else 100000
+    asyncio.run(main(player_count, game_count))
@@ -0,0 +1,77 @@
+# Benchmarks the RTL matchmaking engines on synthetic queues.
+# Usage: python3 bench_matchmaking.py [pool sizes...]
+from datetime import datetime, timedelta
+import random
+import sys
+import time
+from typing import Dict, List, Set
+
+from matchmaking import EloWindowMatchmaker, QueuedPlayer, RandomMatchmaker
+
+
+def create_pool(size: int, now: datetime) -> List[QueuedPlayer]:
+    return [
+        QueuedPlayer(
+            i,
+            random.gauss(1500, 200),
+            now - timedelta(seconds=random.uniform(0, 600)),
+        )
+        for i in range(size)
+    ]
+
+
+def create_recent_opponents(players: List[QueuedPlayer]) -> Dict[int, Set[int]]:
+    recent_opponents: Dict[int, Set[int]] = {}
+    for player in players:
+        opponent = random.choice(players)
+        recent_opponents.setdefault(player.id, set()).add(opponent.id)
+        recent_opponents.setdefault(opponent.id, set()).add(player.id)
+    return recent_opponents
+
+
+def pop_random_pairs(players: List[QueuedPlayer]):
+    # The pairing used before the matchmaking engines, for comparison
+    players = list(players)
+    pairs = []
+    while len(players) > 1:
+        pairs.append(
+            (
+                players.pop(random.randrange(0, len(players))),
+                players.pop(random.randrange(0, len(players))),
+            )
+        )
+    return pairs
+
+
+if __name__ == "__main__":
+    random.seed(17)
+    now = datetime.now()
+    sizes = [int(size) for size in sys.argv[1:]] or [1000, 5000, 20000, 100000]
+    for size in sizes:
+        players = create_pool(size, now)
+        recent_opponents = create_recent_opponents(players)
+        for name, create_pairs in [
+            ("pop_random", lambda: pop_random_pairs(players)),
+            (
+                "random",
+                lambda: RandomMatchmaker().create_pairs(players, recent_opponents, now),
+            ),
+            (
+                "elo_window",
+                lambda: EloWindowMatchmaker().create_pairs(
+                    players, recent_opponents, now
+                ),
+            ),
+        ]:
+            start = time.perf_counter()
+            pairs = create_pairs()
+            duration = time.perf_counter() - start
+            average_difference = sum(abs(a.elo - b.elo) for a, b in pairs) / max(
+                1, len(pairs)
+            )
+            rematches = sum(
+                1 for a, b in pairs if b.id in recent_opponents.get(a.id, set())
+            )
+            print(
+                f"{size:>7} players | {name:<10} | {duration * 1000:8.1f} ms | {len(pairs):>6} pairs | avg Elo diff {average_difference:6.1f} | {rematches} rematches"
+            )
@@ -0,0 +1,148 @@
+import asyncio
+import time
+from typing import Dict, List
+
+import discord
+from discord.ext import commands
+
+from metrics import DISCORD_DELIVERY_LATENCY, DISCORD_METRICS
+from utils import log_message
+
+
+class Broadcaster:
+    """
+    Sends embeds to Discord channels and users concurrently.
+
+    Sends to the same channel or user are serialized, so bursts queue per route behind discord.py's rate limit handling
+    while different routes are sent in parallel. Embeds added with `queue` are coalesced and sent on `flush` as a single message per channel.
+    """
+
+    # Discord allows at most 10 embeds per message
+    MAX_EMBEDS_PER_MESSAGE = 10
+
+    def __init__(self, bot: commands.Bot, max_concurrent_sends: int = 10):
+        self.bot = bot
+        self.semaphore = asyncio.Semaphore(max_concurrent_sends)
+        self.route_locks: Dict[str, asyncio.Lock] = {}
+        # coalescing key -> embeds waiting for the next flush
+        self.queued_embeds: Dict[str, List[discord.Embed]] = {}
+
+    async def send(
+        self,
+        route: str,
+        destination: discord.abc.Messageable,
+        embeds: List[discord.Embed],
+    ):
+        start = time.perf_counter()
+        async with self.route_locks.setdefault(route, asyncio.Lock()):
+            async with self.semaphore:
+                with DISCORD_METRICS.track("send"):
+                    await destination.send(embeds=embeds)
+        # labelled by route type ("channel" or "user") to keep the number of series bounded
+        DISCORD_DELIVERY_LATENCY.observe(
+            (route.split(":")[0],), time.perf_counter() - start
+        )
+
+    async def send_to_user(self, user_id: int, embeds: List[discord.Embed]):
+        user = self.bot.get_user(user_id) or await self.bot.fetch_user(user_id)
+        await self.send(f"user:{user_id}", user, embeds)
+
+    async def broadcast(
+        self,
+        channel_ids: List[int],
+        embeds: List[discord.Embed],
+        context: str,
+        user_ids: List[int] | None = None,
+    ):
+        """
+        Sends the embeds to every channel and user concurrently. Failed sends are logged without affecting the others.
+        """
+        start = time.perf_counter()
+        user_ids = user_ids or []
+        destinations = [f"channel:{channel_id}" for channel_id in channel_ids] + [
+            f"user:{user_id}" for user_id in user_ids
+        ]
+        results = await asyncio.gather(
+            *(
+                self.send(
+                    f"channel:{channel_id}",
+                    self.bot.get_partial_messageable(channel_id),
+                    embeds,
+                )
+                for channel_id in channel_ids
+            ),
+            *(self.send_to_user(user_id, embeds) for user_id in user_ids),
+            return_exceptions=True,
+        )
+        for destination, result in zip(destinations, results):
+            if isinstance(result, Exception):
+                log_message(
+                    f"Failed sending message to {destination}: {repr(result)}",
+                    context,
+                )
+        log_message(
+            f"Delivered {len(embeds)} embed(s) to {len(destinations)} destination(s) in {time.perf_counter() - start:.2f}s",
+            context,
+        )
+
+    async def publish(
+        self,
+        channel_ids: List[int],
+        message_ids: Dict[str, int],
+        embeds: List[discord.Embed],
+        context: str,
+    ):
+        """
+        Keeps one persistent message per channel up to date: edits the channel's message in `message_ids` if there is one,
+        otherwise (or if it was deleted) sends a new message and records its ID.
+        """
+
+        async def publish_to_channel(channel_id: int):
+            channel = self.bot.get_partial_messageable(channel_id)
+            async with self.route_locks.setdefault(
+                f"channel:{channel_id}", asyncio.Lock()
+            ):
+                async with self.semaphore:
+                    if str(channel_id) in message_ids:
+                        try:
+                            with DISCORD_METRICS.track("edit"):
+                                await channel.get_partial_message(
+                                    message_ids[str(channel_id)]
+                                ).edit(embeds=embeds)
+                            return
+                        except discord.NotFound:
+                            pass
+                    with DISCORD_METRICS.track("send"):
+                        message = await channel.send(embeds=embeds)
+                    message_ids[str(channel_id)] = message.id
+
+        start = time.perf_counter()
+        results = await asyncio.gather(
+            *(publish_to_channel(channel_id) for channel_id in channel_ids),
+            return_exceptions=True,
+        )
+        for channel_id, result in zip(channel_ids, results):
+            if isinstance(result, Exception):
+                log_message(
+                    f"Failed publishing message to channel:{channel_id}: {repr(result)}",
+                    context,
+                )
+        log_message(
+            f"Published {len(embeds)} embed(s) to {len(channel_ids)} channel(s) in {time.perf_counter() - start:.2f}s",
+            context,
+        )
+
+    def queue(self, key: str, embed: discord.Embed):
+        self.queued_embeds.setdefault(key, []).append(embed)
+
+    async def flush(self, key: str, channel_ids: List[int], context: str):
+        """
+        Sends every embed queued under the key to each channel, batched into as few messages as possible.
+        """
+        embeds = self.queued_embeds.pop(key, [])
+        for offset in range(0, len(embeds), Broadcaster.MAX_EMBEDS_PER_MESSAGE):
+            await self.broadcast(
+                channel_ids,
+                embeds[offset : offset + Broadcaster.MAX_EMBEDS_PER_MESSAGE],
+                context,
+            )
@@ -0,0 +1,178 @@
+from array import array
+from collections import Counter
+import json
+import os
+import sys
+from typing import Dict, Iterable, List, Tuple
+
+from _types import WarzonePlayer
+from cl_records import ClotGame
+
+
+class ClotGameColumns:
+    """
+    Columnar, integer-encoded view of the scraped games of a CL.
+
+    Templates, divisions and players are stored once in lookup tables and referenced by index. Games are stored as parallel arrays,
+    and the players of game `i` are the slots in `[game_slot_offsets[i], game_slot_offsets[i + 1])` of the slot arrays.
+    """
+
+    # Name and array typecode of every column, in the order they are written to disk
+    COLUMNS: List[Tuple[str, str]] = [
+        ("game_ids", "q"),
+        ("game_start_times", "q"),
+        ("game_turns", "i"),
+        ("game_divisions", "i"),
+        ("game_templates", "i"),
+        ("game_slot_offsets", "q"),
+        ("slot_players", "i"),
+        ("slot_won", "b"),
+        ("player_ids", "q"),
+    ]
+
+    def __init__(self, cl: str):
+        self.cl = cl
+        self.divisions: List[str] = []
+        self.templates: List[str] = []
+        self.player_names: List[str] = []
+        self.game_ids = array("q")
+        self.game_start_times = array("q")
+        self.game_turns = array("i")
+        self.game_divisions = array("i")
+        self.game_templates = array("i")
+        self.game_slot_offsets = array("q", [0])
+        self.slot_players = array("i")
+        self.slot_won = array("b")
+        self.player_ids = array("q")
+
+        self.division_index: Dict[str, int] = {}
+        self.template_index: Dict[str, int] = {}
+        self.player_index: Dict[int, int] = {}
+
+    @staticmethod
+    def from_games(cl: str, games: Iterable[ClotGame]) -> "ClotGameColumns":
+        columns = ClotGameColumns(cl)
+        for game in games:
+            columns.add_game(game)
+        return columns
+
+    def encode(self, value: str, values: List[str], index: Dict[str, int]) -> int:
+        if value not in index:
+            index[value] = len(values)
+            values.append(value)
+        return index[value]
+
+    def add_game(self, game: ClotGame):
+        self.game_ids.append(int(game.link.split("GameID=")[-1]))
+        self.game_start_times.append(int(game.start_time.timestamp()))
+        self.game_turns.append(game.turn)
+        self.game_divisions.append(
+            self.encode(game.division, self.divisions, self.division_index)
+        )
+        self.game_templates.append(
+            self.encode(game.template, self.templates, self.template_index)
+        )
+        for player in game.players:
+            if player.id not in self.player_index:
+                self.player_index[player.id] = len(self.player_ids)
+                self.player_ids.append(player.id)
+                self.player_names.append(player.name)
+            self.slot_players.append(self.player_index[player.id])
+            self.slot_won.append(player.outcome == WarzonePlayer.Outcome.WON)
+        self.game_slot_offsets.append(len(self.slot_players))
+
+    def write(self, file_name: str):
+        """
+        Writes a JSON header line (lookup tables and column lengths) followed by the raw bytes of every column.
+        """
+        header = {
+            "cl": self.cl,
+            "byteorder": sys.byteorder,
+            "divisions": self.divisions,
+            "templates": self.templates,
+            "player_names": self.player_names,
+            "lengths": {name: len(getattr(self, name)) for name, _ in self.COLUMNS},
+        }
+        with open(f"{file_name}.tmp", "wb") as file:
+            file.write(json.dumps(header).encode("utf-8") + b"\n")
+            for name, _ in self.COLUMNS:
+                getattr(self, name).tofile(file)
+        os.replace(f"{file_name}.tmp", file_name)
+
+    @staticmethod
+    def read(file_name: str) -> "ClotGameColumns":
+        with open(file_name, "rb") as file:
+            header = json.loads(file.readline())
+            columns = ClotGameColumns(header["cl"])
+            columns.divisions = header["divisions"]
+            columns.templates = header["templates"]
+            columns.player_names = header["player_names"]
+            for name, typecode in ClotGameColumns.COLUMNS:
+                column = array(typecode)
+                column.fromfile(file, header["lengths"][name])
+                if header["byteorder"] != sys.byteorder:
+                    column.byteswap()
+                setattr(columns, name, column)
+
+        columns.division_index = {d: i for i, d in enumerate(columns.divisions)}
+        columns.template_index = {t: i for i, t in enumerate(columns.templates)}
+        columns.player_index = {p: i for i, p in enumerate(columns.player_ids)}
+        return columns
+
+    ###################
+    ##### Queries #####
+    ###################
+
+    def game_count(self) -> int:
+        return len(self.game_ids)
+
+    def player_records(self, division: str | None = None) -> Dict[int, Tuple[int, int]]:
+        """
+        Returns a mapping of player ID -> (wins, losses), optionally limited to a single division.
+        """
+        wins: Counter = Counter()
+        games: Counter = Counter()
+        if division is None:
+            for player, won in zip(self.slot_players, self.slot_won):
+                games[player] += 1
+                wins[player] += won
+        elif division in self.division_index:
+            division_id = self.division_index[division]
+            for game, game_division in enumerate(self.game_divisions):
+                if game_division != division_id:
+                    continue
+                for slot in range(
+                    self.game_slot_offsets[game], self.game_slot_offsets[game + 1]
+                ):
+                    games[self.slot_players[slot]] += 1
+                    wins[self.slot_players[slot]] += self.slot_won[slot]
+
+        return {
+            self.player_ids[player]: (wins[player], count - wins[player])
+            for player, count in games.items()
+        }
+
+    def player_record(self, player_id: int) -> Tuple[int, int]:
+        """
+        Returns the (wins, losses) of a single player across the CL.
+        """
+        if player_id not in self.player_index:
+            return 0, 0
+        player = self.player_index[player_id]
+        wins = games = 0
+        for slot_player, won in zip(self.slot_players, self.slot_won):
+            if slot_player == player:
+                games += 1
+                wins += won
+        return wins, games - wins
+
+    def player_name(self, player_id: int) -> str:
+        return self.player_names[self.player_index[player_id]]
+
+    def template_counts(self) -> Dict[str, int]:
+        counts = Counter(self.game_templates)
+        return {self.templates[template]: count for template, count in counts.items()}
+
+    def division_counts(self) -> Dict[str, int]:
+        counts = Counter(self.game_divisions)
+        return {self.divisions[division]: count for division, count in counts.items()}
@@ -0,0 +1,170 @@
+from datetime import datetime
+import json
+import os
+from typing import Dict, Iterator, List
+
+from _types import WarzonePlayer
+from utils import log_message, read_pickled_file
+
+
+class ClotGame:
+
+    def __init__(
+        self,
+        cl: str,
+        division: str,
+        template: str,
+        link: str,
+        players: List[WarzonePlayer],
+        winner: List[int],
+        start_time: datetime,
+        turn: int,
+    ):
+        self.cl: str = cl
+        self.division: str = division
+        self.template: str = template
+        self.link: str = link
+        self.players: List[WarzonePlayer] = players
+        self.winner: List[int] = winner
+        self.start_time: datetime = start_time
+        self.turn: int = turn
+
+    def __repr__(self) -> str:
+        output_str = " vs ".join([str(player) for player in sorted(self.players)])
+        output_str += f"\n\tCL: {self.cl}"
+        output_str += f"\n\tDivision: {self.division}"
+        output_str += f"\n\tTemplate: {self.template}"
+        output_str += f"\n\tWinner: {self.winner}"
+        output_str += f"\n\tStart time: {self.start_time}"
+        output_str += f"\n\tRound: {self.turn}"
+        output_str += f"\n\tLink: {self.link}"
+        return output_str
+
+    def to_record(self) -> Dict:
+        return {
+            "cl": self.cl,
+            "division": self.division,
+            "template": self.template,
+            "link": self.link,
+            "players": [
+                {
+                    "name": player.name,
+                    "id": player.id,
+                    "team": player.team,
+                    "outcome": player.outcome.value,
+                }
+                for player in self.players
+            ],
+            "winner": self.winner,
+            "start_time": self.start_time.isoformat(),
+            "turn": self.turn,
+        }
+
+    @staticmethod
+    def from_record(record: Dict) -> "ClotGame":
+        return ClotGame(
+            record["cl"],
+            record["division"],
+            record["template"],
+            record["link"],
+            [
+                WarzonePlayer(
+                    player["name"], player["id"], player["outcome"], player["team"]
+                )
+                for player in record["players"]
+            ],
+            record["winner"],
+            datetime.fromisoformat(record["start_time"]),
+            record["turn"],
+        )
+
+
+class ClotGameLog:
+    """
+    Append-only JSON Lines store of scraped CL games.
+
+    Each match is written once as a single line, so checkpointing only needs a flush rather than rewriting every game found so far.
+    """
+
+    def __init__(self, file_name: str):
+        self.file_name = file_name
+        self.truncate_partial_record()
+        self.count = sum(1 for _ in self.read_records())
+        self.file = open(file_name, "a", encoding="utf-8")
+
+    def truncate_partial_record(self):
+        """
+        Cuts off a partial last line left by a crash mid-append, so the next record does not get written onto its end.
+
+        The game in the partial line is found again, since the scrape checkpoint never gets past games that are not flushed.
+        """
+        if not os.path.exists(self.file_name):
+            return
+        with open(self.file_name, "rb+") as file:
+            end = file.seek(0, os.SEEK_END)
+            position = end
+            while position > 0:
+                chunk_start = max(0, position - 4096)
+                file.seek(chunk_start)
+                newline = file.read(position - chunk_start).rfind(b"\n")
+                if newline != -1:
+                    position = chunk_start + newline + 1
+                    break
+                position = chunk_start
+            if position != end:
+                file.truncate(position)
+                log_message(
+                    f"Removed a partial record ({end - position} bytes) from {self.file_name}",
+                    "CCS",
+                )
+
+    def append(self, game: ClotGame):
+        self.file.write(json.dumps(game.to_record()) + "\n")
+        self.count += 1
+
+    def flush(self):
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def close(self):
+        self.file.close()
+
+    def read_records(self) -> Iterator[Dict]:
+        if not os.path.exists(self.file_name):
+            return
+        with open(self.file_name, "r", encoding="utf-8") as file:
+            for line in file:
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    # partial lines are truncated on open, so this is a corrupted record
+                    log_message(
+                        f"Skipping unreadable record in {self.file_name}", "CCS"
+                    )
+
+    def __iter__(self) -> Iterator[ClotGame]:
+        """
+        Streams the stored games, skipping duplicates left by re-scanning IDs after a crash.
+        """
+        seen_links = set()
+        for record in self.read_records():
+            if record["link"] not in seen_links:
+                seen_links.add(record["link"])
+                yield ClotGame.from_record(record)
+
+    @staticmethod
+    def migrate_pickled_games(pickle_file_name: str, file_name: str):
+        """
+        Converts the legacy jsonpickle list of games into a record log, if the log does not exist yet.
+        """
+        if os.path.exists(file_name) or not os.path.exists(pickle_file_name):
+            return
+        games: List[ClotGame] = read_pickled_file(pickle_file_name)
+        with open(f"{file_name}.tmp", "w", encoding="utf-8") as file:
+            for game in games:
+                file.write(json.dumps(game.to_record()) + "\n")
+        os.replace(f"{file_name}.tmp", file_name)
+        log_message(
+            f"Migrated {len(games)} games from {pickle_file_name} to {file_name}",
+            "CCS",
+        )
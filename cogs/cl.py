@@ -1,6 +1,9 @@
 from datetime import datetime
+import hashlib
+import json
+import os
 import random
-from typing import Dict, List
+from typing import Dict, List, Tuple
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.cron import CronTrigger
 import discord
@@ -9,9 +12,10 @@ from discord.ext import commands
 
 from _types import WarzoneCog
 from config import Config
-from sheet import GoogleSheet
+from metrics import DISCORD_METRICS
+from sheet import AsyncGoogleSheet, GoogleSheet
 from utils import log_exception, log_message
-from warzone_api import WarzoneAPI
+from warzone_api import AsyncWarzoneAPI
 
 
 class CLSheetInfo:
@@ -34,6 +38,9 @@ CLAN_LEAGUE_SHEET = CLSheetInfo(
     "61",
 )
 
+# Persists the standings hashes so unchanged standings are not re-posted after a restart
+STANDINGS_HASHES_FILE = "data/cl_standings_hashes.json"
+
 # This is used to shorten clan names shown on the sheet.
 # This allows for easier formatting and reducing the same of the embed.
 SHORT_NAMES = {
@@ -49,18 +56,29 @@ class CLCommands(WarzoneCog):
         bot: commands.Bot,
         config: Config,
         scheduler: AsyncIOScheduler,
-        warzone_api: WarzoneAPI,
+        warzone_api: AsyncWarzoneAPI,
     ) -> None:
         self.bot = bot
         self.config = config
         self.warzone_api = warzone_api
-        self.sheet = GoogleSheet(CLAN_LEAGUE_SHEET.sheet_id, False)
+        self.sheet = AsyncGoogleSheet(GoogleSheet(CLAN_LEAGUE_SHEET.sheet_id, False))
+        self.standings = CLCommands.Standings()
+        # "<sheet id>:<embed id>" -> hash of the standings last written to that embed
+        self.standings_hashes: Dict[str, str] = {}
+        if os.path.exists(STANDINGS_HASHES_FILE):
+            try:
+                with open(STANDINGS_HASHES_FILE, "r") as file:
+                    self.standings_hashes = json.load(file)
+            except json.JSONDecodeError as e:
+                # the embeds are simply rewritten once more
+                log_message(f"Ignoring unreadable {STANDINGS_HASHES_FILE}", "cl")
+                log_exception(e)
 
         log_message("Scheduled CLCommands.engine", "bot")
         self.scheduler = scheduler
         self.scheduler.add_job(
             self.run_engine,
-            CronTrigger(hour="*", minute="25", second="0"),
+            CronTrigger(hour="*", minute="*/2", second="0"),
             name="CL_engine",
         )
 
@@ -82,36 +100,16 @@ class CLCommands(WarzoneCog):
             f"Creating new CL embed from {interaction.user.name}", "cl.cl_create_embeds"
         )
 
-        standings = self.sheet.get_rows(f"Summary!B4:O{CLAN_LEAGUE_SHEET.end_index}")
-        division = None
-        standings_output: Dict[str, List[CLCommands.ClanStandings]] = {}
-        for row in standings:
-            row.extend("" for _ in range(14 - len(row)))
-            if not row[0]:
-                # division end
-                division = None
-            elif "Division" in row[0] and "Tournament Winners" not in row[0]:
-                # parse division
-                division = row[0].strip()
-                standings_output[division] = []
-            elif division and row[0] != "Clan":
-                # parse team
-                standings_output[division].append(
-                    CLCommands.ClanStandings(row[0], *row[2:13])
-                )
-
-        for division, clans in standings_output.items():
-            embed.add_field(
-                name=division,
-                value=f"```{'Clan':20} | {'TP':>3} | {'MP':>3} | {'%PC':>5} | GR{chr(10)}{f'{chr(10)}'.join([clan.create_embed_string() for clan in clans])}```"[
-                    0:1024
-                ],
-                inline=False,
-            )
+        standings = await self.sheet.get_rows(
+            f"Summary!B4:O{CLAN_LEAGUE_SHEET.end_index}"
+        )
+        self.standings.update(standings)
+        self.standings.add_embed_fields(embed)
 
         embed.timestamp = datetime.now()
         discord_channel = await self.bot.fetch_channel(self.config.cl_standings_channel)
-        await discord_channel.send(embed=embed)
+        with DISCORD_METRICS.track("send"):
+            await discord_channel.send(embed=embed)
         await interaction.response.send_message(ephemeral=True)
 
     #####################
@@ -158,49 +156,110 @@ class CLCommands(WarzoneCog):
                 f"{name:20} | {self.tp:3g} | {self.mp:3g} | {self.pc:5} | {self.gr:2g}"
             )
 
-    async def update_cl_standings_embeds(self):
-        try:
-            if CLAN_LEAGUE_SHEET.embed_id is None:
-                # no embed exists yet
-                return
-            discord_channel = await self.bot.fetch_channel(
-                self.config.cl_standings_channel
-            )
-            message = await discord_channel.fetch_message(CLAN_LEAGUE_SHEET.embed_id)
-            embed = message.embeds[0]
-            # embed.description = "Scores are shown as:\n```Team | Pts | MP```"
-            embed.clear_fields()
+    class Standings:
+        """
+        Parses the Summary sheet rows into the per-division embed fields shared by every CL embed.
 
-            standings = self.sheet.get_rows(
-                f"Summary!B4:O{CLAN_LEAGUE_SHEET.end_index}"
-            )
+        Rendered fields are cached by the rows of their division, so only divisions whose rows changed are re-parsed and re-rendered.
+        """
+
+        def __init__(self):
+            # division -> (rows the field was rendered from, rendered field value)
+            self.rendered_divisions: Dict[
+                str, Tuple[Tuple[Tuple[str, ...], ...], str]
+            ] = {}
+            # (division, rendered field value) in sheet order
+            self.fields: List[Tuple[str, str]] = []
+
+        def group_rows_by_division(
+            self, rows: List[List[str]]
+        ) -> Dict[str, Tuple[Tuple[str, ...], ...]]:
             division = None
-            standings_output: Dict[str, List[CLCommands.ClanStandings]] = {}
-            for row in standings:
-                row.extend("" for _ in range(14 - len(row)))
+            division_rows: Dict[str, List[Tuple[str, ...]]] = {}
+            for row in rows:
+                row = row + ["" for _ in range(14 - len(row))]
                 if not row[0]:
                     # division end
                     division = None
                 elif "Division" in row[0] and "Tournament Winners" not in row[0]:
                     # parse division
                     division = row[0].strip()
-                    standings_output[division] = []
+                    division_rows[division] = []
                 elif division and row[0] != "Clan":
-                    # parse team
-                    standings_output[division].append(
-                        CLCommands.ClanStandings(row[0], *row[2:13])
+                    # team row
+                    division_rows[division].append(tuple(row[:13]))
+            return {division: tuple(rows) for division, rows in division_rows.items()}
+
+        def render_division(self, rows: Tuple[Tuple[str, ...], ...]) -> str:
+            clans = [CLCommands.ClanStandings(row[0], *row[2:13]) for row in rows]
+            return f"```{'Clan':20} | {'TP':>3} | {'MP':>3} | {'%PC':>5} | GR{chr(10)}{f'{chr(10)}'.join([clan.create_embed_string() for clan in clans])}```"[
+                0:1024
+            ]
+
+        def update(self, rows: List[List[str]]):
+            fields = []
+            rendered_divisions = {}
+            for division, division_rows in self.group_rows_by_division(rows).items():
+                cached = self.rendered_divisions.get(division)
+                if cached and cached[0] == division_rows:
+                    rendered_divisions[division] = cached
+                else:
+                    rendered_divisions[division] = (
+                        division_rows,
+                        self.render_division(division_rows),
                     )
+                fields.append((division, rendered_divisions[division][1]))
+            # divisions no longer on the sheet are dropped from the cache
+            self.rendered_divisions = rendered_divisions
+            self.fields = fields
 
-            for division, clans in standings_output.items():
-                embed.add_field(
-                    name=division,
-                    value=f"```{'Clan':20} | {'TP':>3} | {'MP':>3} | {'%PC':>5} | GR{chr(10)}{f'{chr(10)}'.join([clan.create_embed_string() for clan in clans])}```"[
-                        0:1024
-                    ],
-                    inline=False,
+        def get_hash(self) -> str:
+            return hashlib.sha256(json.dumps(self.fields).encode()).hexdigest()
+
+        def add_embed_fields(self, embed: discord.Embed):
+            for division, value in self.fields:
+                embed.add_field(name=division, value=value, inline=False)
+
+    async def update_cl_standings_embeds(self):
+        try:
+            if CLAN_LEAGUE_SHEET.embed_id is None:
+                # no embed exists yet
+                return
+
+            standings = await self.sheet.get_rows(
+                f"Summary!B4:O{CLAN_LEAGUE_SHEET.end_index}"
+            )
+            if not standings:
+                # sheet read failed, keep the current embed rather than clearing it
+                log_message(
+                    f"No standings returned for {CLAN_LEAGUE_SHEET.name}",
+                    "cl.update_cl_standings_embeds",
                 )
+                return
+            self.standings.update(standings)
+
+            standings_key = f"{CLAN_LEAGUE_SHEET.sheet_id}:{CLAN_LEAGUE_SHEET.embed_id}"
+            standings_hash = self.standings.get_hash()
+            if self.standings_hashes.get(standings_key) == standings_hash:
+                # standings are unchanged, skip the discord edit
+                return
+
+            discord_channel = await self.bot.fetch_channel(
+                self.config.cl_standings_channel
+            )
+            message = await discord_channel.fetch_message(CLAN_LEAGUE_SHEET.embed_id)
+            embed = message.embeds[0]
+            # embed.description = "Scores are shown as:\n```Team | Pts | MP```"
+            embed.clear_fields()
+            self.standings.add_embed_fields(embed)
             embed.timestamp = datetime.now()
-            await message.edit(embed=embed)
+            with DISCORD_METRICS.track("edit"):
+                await message.edit(embed=embed)
+            self.standings_hashes[standings_key] = standings_hash
+            # written to a temporary file first so a crash mid-write never leaves a truncated file
+            with open(f"{STANDINGS_HASHES_FILE}.tmp", "w") as file:
+                json.dump(self.standings_hashes, file)
+            os.replace(f"{STANDINGS_HASHES_FILE}.tmp", STANDINGS_HASHES_FILE)
             log_message(
                 f"Successfully updated the embed for {CLAN_LEAGUE_SHEET.name}",
                 "cl.update_cl_standings_embeds",
@@ -208,6 +267,9 @@ class CLCommands(WarzoneCog):
         except Exception as e:
             log_exception(e)
 
+    async def cog_unload(self):
+        self.sheet.close()
+
     async def run_engine(self):
-        # runs every hour to update the discord CL server standings embed with latest sheet info
+        # runs every 2 minutes to update the discord CL server standings embed with latest sheet info
         await self.update_cl_standings_embeds()
@@ -1,24 +1,24 @@
-# https://warlight-mtl.com/api/v1.0/players/
-
+import asyncio
 from datetime import datetime
 import random
-from typing import Dict, List
+from typing import Dict, List, Tuple
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.cron import CronTrigger
 import discord
 from discord import app_commands
 from discord.ext import commands
-import requests
 
 from _types import WarzoneCog
 from config import Config
 from database import MTLChannel
+from metrics import DISCORD_METRICS
+from mtl_api import MTLAPI
 from sheet import GoogleSheet
 from utils import log_exception, log_message
-from warzone_api import WarzoneAPI
+from warzone_api import AsyncWarzoneAPI
 
-MTL_API_LINK = "https://warlight-mtl.com/api/v1.0/players/?topk=10"
-MTL_GAME_API_LINK = "https://warlight-mtl.com/api/v1.0/games/?topk=10"
+# Upper bound on in-flight embed edits (discord.py still handles per-route 429s)
+MAX_CONCURRENT_EMBED_EDITS = 5
 
 
 class MTLCommands(WarzoneCog):
@@ -28,11 +28,14 @@ class MTLCommands(WarzoneCog):
         bot: commands.Bot,
         config: Config,
         scheduler: AsyncIOScheduler,
-        warzone_api: WarzoneAPI,
+        warzone_api: AsyncWarzoneAPI,
     ) -> None:
         self.bot = bot
         self.config = config
         self.warzone_api = warzone_api
+        self.mtl_api = MTLAPI()
+        # (channel id, message id) -> partial message used to edit the standings embed without fetching it first
+        self.standings_messages: Dict[Tuple[int, int], discord.PartialMessage] = {}
 
         log_message("Scheduled MTLCommands.engine", "bot")
         self.scheduler = scheduler
@@ -46,11 +49,11 @@ class MTLCommands(WarzoneCog):
     ##### CL commands #####
     #######################
 
-    def get_mtl_player_data(self):
-        return requests.get(f"{MTL_API_LINK}", verify=False).json()
+    async def get_mtl_player_data(self):
+        return await self.mtl_api.get_player_data()
 
-    def get_mtl_game_data(self):
-        return requests.get(f"{MTL_GAME_API_LINK}", verify=False).json()
+    async def get_mtl_game_data(self):
+        return await self.mtl_api.get_game_data()
 
     def format_discord_embed(self, player_data, game_data):
         embed = discord.Embed(
@@ -104,8 +107,9 @@ class MTLCommands(WarzoneCog):
                 "This channel already has an MTL standings post created"
             )
 
-        player_data = self.get_mtl_player_data()
-        game_data = self.get_mtl_game_data()
+        player_data, game_data = await asyncio.gather(
+            self.get_mtl_player_data(), self.get_mtl_game_data()
+        )
         embed = self.format_discord_embed(player_data, game_data)
         new_embed = await interaction.response.send_message(embed=embed)
         await MTLChannel.create(
@@ -119,19 +123,46 @@ class MTLCommands(WarzoneCog):
     ##### CL engine #####
     #####################
 
+    def get_standings_message(self, channel: MTLChannel) -> discord.PartialMessage:
+        key = (channel.id, channel.message_id)
+        if key not in self.standings_messages:
+            self.standings_messages[key] = self.bot.get_partial_messageable(
+                channel.id, guild_id=int(channel.server_id)
+            ).get_partial_message(channel.message_id)
+        return self.standings_messages[key]
+
     async def update_mtl_standings_embeds(self):
         try:
-            player_data = self.get_mtl_player_data()
-            game_data = self.get_mtl_game_data()
+            player_data, game_data = await asyncio.gather(
+                self.get_mtl_player_data(), self.get_mtl_game_data()
+            )
             embed = self.format_discord_embed(player_data, game_data)
 
-            for channel in await MTLChannel.all():
-                discord_channel = await self.bot.fetch_channel(channel.id)
-                message = await discord_channel.fetch_message(channel.message_id)
-                await message.edit(embed=embed)
+            semaphore = asyncio.Semaphore(MAX_CONCURRENT_EMBED_EDITS)
+
+            async def edit_embed(channel: MTLChannel):
+                async with semaphore:
+                    with DISCORD_METRICS.track("edit"):
+                        await self.get_standings_message(channel).edit(embed=embed)
+
+            channels = await MTLChannel.all()
+            results = await asyncio.gather(
+                *(edit_embed(channel) for channel in channels), return_exceptions=True
+            )
+            for channel, result in zip(channels, results):
+                if isinstance(result, Exception):
+                    log_message(
+                        f"Failed updating the MTL embed in {channel.channel_name} ({channel.id}): {repr(result)}",
+                        "mtl.update_mtl_standings_embeds",
+                    )
+                    # drop the cached handle in case the message was deleted or moved
+                    self.standings_messages.pop((channel.id, channel.message_id), None)
         except Exception as e:
             log_exception(e)
 
+    async def cog_unload(self):
+        await self.mtl_api.close()
+
     async def run_engine(self):
         # runs every hour to update the discord CL server standings embed with latest sheet info
         await self.update_mtl_standings_embeds()
@@ -1,26 +1,30 @@
 import asyncio
+from collections import deque
 from datetime import datetime, timedelta, timezone
 import random
-from typing import List, Tuple
+import time
+from typing import Deque, Dict, List, Set, Tuple
 from apscheduler.job import Job
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
-from apscheduler.triggers.cron import CronTrigger
+from apscheduler.triggers.interval import IntervalTrigger
 import discord
 from discord import app_commands
 from discord.ext import commands
 from tortoise.expressions import Q
+from tortoise.transactions import in_transaction
 import requests
 
-from _types import Game, WarzoneCog, WarzonePlayer
+from _types import Game, WarzoneCog, WarzoneGame, WarzonePlayer
+from broadcaster import Broadcaster
 from config import Config
 from database import RTLGameModel, RTLPlayerModel
+from leaderboard import Leaderboard, LeaderboardEntry
+from matchmaking import EloWindowMatchmaker, Matchmaker, QueuedPlayer
+from metrics import RTL_TICK_METRICS
+from player_history import PlayerHistory
+from poll_scheduler import PollScheduler
 from utils import log_exception, log_message
-from warzone_api import WarzoneAPI
-
-
-def pop_random(l: List):
-    return l.pop(random.randrange(0, len(l)))
-
+from warzone_api import AsyncWarzoneAPI
 
 RTL_TEMPLATES: List[Tuple[int, str]] = [
     (1540231, "Strategic MME"),
@@ -29,6 +33,30 @@ RTL_TEMPLATES: List[Tuple[int, str]] = [
     (1540235, "Volcano Island"),
 ]
 
+# Players who played each other within this period are only re-paired if there is no better option
+REMATCH_LOOKBACK = timedelta(hours=2)
+
+# Seconds to wait after an active player change before updating the roster, collecting any further changes
+ROSTER_UPDATE_DELAY = 10
+
+# Upper bound on in-flight GameFeed requests per tick (the API client also rate limits globally)
+MAX_CONCURRENT_GAME_POLLS = 10
+
+# Upper bound on games being created at once per tick
+MAX_CONCURRENT_GAME_CREATIONS = 5
+
+# Number of players shown by /rtl_standings
+STANDINGS_SIZE = 10
+
+# Seconds between engine ticks. Each tick only polls the games that are due
+ENGINE_TICK_SECONDS = 10
+
+# Most GameFeed polls the engine may make per minute, however many games are open
+POLL_BUDGET_PER_MINUTE = 120
+
+# Matchmaking runs on joins and finished games, and at least this often so waiting players' rating windows widen
+MATCHMAKING_INTERVAL = timedelta(minutes=1)
+
 
 class RTLCommands(WarzoneCog):
 
@@ -37,17 +65,45 @@ class RTLCommands(WarzoneCog):
         bot: commands.Bot,
         config: Config,
         scheduler: AsyncIOScheduler,
-        warzone_api: WarzoneAPI,
+        warzone_api: AsyncWarzoneAPI,
     ) -> None:
         self.bot = bot
         self.config = config
         self.warzone_api = warzone_api
+        self.tick_durations: Deque[float] = deque(maxlen=60)
+        self.broadcaster = Broadcaster(bot)
+        self.roster_update_task: asyncio.Task | None = None
+        self.is_roster_update_requested = False
+        self.matchmaker: Matchmaker = EloWindowMatchmaker()
+        # warzone id -> when the player was first seen waiting for a game
+        self.queued_since: Dict[int, datetime] = {}
+        # ratings are served from memory, the standings embed is rendered again only once the top players change
+        self.leaderboard = Leaderboard()
+        self.standings_embed: discord.Embed | None = None
+        self.player_history = PlayerHistory()
+        self.poll_scheduler = PollScheduler(POLL_BUDGET_PER_MINUTE)
+        # serializes matchmaking and game updates, so players freed by a finished game are never paired twice
+        self.engine_lock = asyncio.Lock()
+        self.matchmaking_task: asyncio.Task | None = None
+        self.is_matchmaking_requested = False
+        self.last_matchmaking = datetime.min
+        # set by rtl_kill, stops both the engine ticks and matchmaking requested by joins
+        self.is_killed = False
 
         log_message("Scheduled RTLCommands.engine", "bot")
         self.scheduler = scheduler
         self.scheduler.add_job(
-            self.run_engine, CronTrigger(hour="*", minute="*", second="0"), name="RTL"
+            self.run_engine,
+            IntervalTrigger(seconds=ENGINE_TICK_SECONDS),
+            name="RTL",
+        )
+
+    async def cog_load(self):
+        players = await RTLPlayerModel.all().values_list(
+            "warzone_id", "name", "elo", "wins", "losses"
         )
+        self.leaderboard.load([LeaderboardEntry(*player) for player in players])
+        log_message(f"Loaded {len(players)} players into the leaderboard", "RTL")
 
     ########################
     ##### RTL commands #####
@@ -71,7 +127,7 @@ class RTLCommands(WarzoneCog):
                     # check if player is eligible for RTL based on templates
                     for offset in range(0, len(RTL_TEMPLATES), 10):
                         validate_token_response = (
-                            self.warzone_api.validate_player_template_access(
+                            await self.warzone_api.validate_player_template_access(
                                 token,
                                 [
                                     str(template[0])
@@ -101,11 +157,12 @@ class RTLCommands(WarzoneCog):
                             )
 
                     # create new player
-                    await RTLPlayerModel.create(
+                    new_player = await RTLPlayerModel.create(
                         warzone_id=player["id"],
                         name=player["name"],
                         discord_id=interaction.user.id,
                     )
+                    self.update_leaderboard([new_player])
                     log_message(
                         f"{interaction.user.name} ({interaction.user.id}) linked their discord to warzone: {player['name']} ({player['id']})",
                         "RTL.link",
@@ -137,11 +194,11 @@ class RTLCommands(WarzoneCog):
                 not player.active or player.join_single_game != join_single_game
             ):
                 validate_blacklist_player = (
-                    self.warzone_api.validate_player_template_access(
+                    await self.warzone_api.validate_player_template_access(
                         str(player.warzone_id), []
                     )
                 )
-                if validate_blacklist_player[0]:
+                if not validate_blacklist_player[0]:
                     # player blacklisted the clot
                     log_message(
                         f"{interaction.user.name} ({interaction.user.id}) blacklisted the CLOT account: {player.warzone_id=}.",
@@ -161,7 +218,8 @@ class RTLCommands(WarzoneCog):
                 await interaction.response.send_message(
                     f"[{player.name}](<https://www.warzone.com/Profile?p={player.warzone_id}>) successfully joined the RTL ladder."
                 )
-                await self.notify_active_players()
+                self.request_roster_update()
+                self.request_matchmaking()
             elif player:
                 # if player is already joined and has same game preference
                 await interaction.response.send_message(
@@ -190,7 +248,7 @@ class RTLCommands(WarzoneCog):
                 await interaction.response.send_message(
                     f"[{player.name}](<https://www.warzone.com/Profile?p={player.warzone_id}>) successfully left the RTL ladder."
                 )
-                await self.notify_active_players()
+                self.request_roster_update()
             elif player:
                 await interaction.response.send_message(
                     f"[{player.name}](<https://www.warzone.com/Profile?p={player.warzone_id}>) is not joined to the RTL ladder."
@@ -207,60 +265,59 @@ class RTLCommands(WarzoneCog):
     )
     async def rtl_standings(self, interaction: discord.Interaction):
         try:
-            # Called whenever there is a change to active players on the RTL (added/removed)
-            players = await RTLPlayerModel.filter().order_by("-elo").limit(10).all()
-
-            embed = discord.Embed(
-                title=f"JR17's real-time ladder - standings",
-            )
-            # players are joined to the ladder
-            active_players_list = []
-            for i, player in enumerate(players):
-                active_players_list.append(
-                    f"{i+1:2}. {player.elo:.0f} - [{player.name}](<https://www.warzone.com/Profile?p={player.warzone_id}>)  ({player.wins}W - {player.losses}L)"
-                )
-            embed.description = "\n".join(active_players_list)
-            await interaction.response.send_message(embed=embed)
+            await interaction.response.send_message(embed=self.get_standings_embed())
         except Exception as e:
             log_exception(e)
 
     @app_commands.command(name="rtl_profile", description="Show a players RTL profile.")
-    async def rtl_profile(self, interaction: discord.Interaction, discord_id: str):
+    async def rtl_profile(
+        self, interaction: discord.Interaction, discord_id: str, page: int = 1
+    ):
         try:
             discord_id: int = int(discord_id)
-            # Called whenever there is a change to active players on the RTL (added/removed)
             player = await RTLPlayerModel.filter(discord_id=discord_id).first()
             if not player:
-                # no player found
-                pass
-
-            player_games = (
-                await RTLGameModel.filter(
-                    Q(player_a=player) | Q(player_b=player), ended__not_isnull=True
+                return await interaction.response.send_message(
+                    f"No warzone player found linked to that discord account."
                 )
-                .order_by("-ended")
-                .limit(10)
-                .prefetch_related("player_a", "player_b", "winner")
-                .all()
+
+            page = max(1, page)
+            games_list, has_next_page = await self.player_history.get_page(
+                player.warzone_id, page
             )
             embed = discord.Embed(
                 title=f"JR17's real-time ladder - profile",
             )
-            # players are joined to the ladder
-            games_list = []
-            for game in player_games:
-                other_player: RTLPlayerModel = (
-                    game.player_b
-                    if game.player_a_id == player.warzone_id
-                    else game.player_a
-                )
-                games_list.append(
-                    f"{'WON ' if game.winner_id == player.warzone_id else 'LOST' } vs [{other_player.name}](<https://www.warzone.com/Profile?p={other_player.warzone_id}>) - [link](https://www.warzone.com/MultiPlayer?GameID={game.id}) - {other_player.elo:.0f} ({other_player.wins}W - {other_player.losses}L)"
-                )
+            rank_str = (
+                f"#{self.leaderboard.get_rank(player.warzone_id) + 1}/{len(self.leaderboard)} "
+                if player.warzone_id in self.leaderboard
+                else ""
+            )
             embed.description = (
-                f"[{player.name}](<https://www.warzone.com/Profile?p={player.warzone_id}>) - {player.elo:.0f} ({player.wins}W - {player.losses}L)\n\n"
-                + "\n".join(games_list)
+                f"{rank_str}[{player.name}](<https://www.warzone.com/Profile?p={player.warzone_id}>) - {player.elo:.0f} ({player.wins}W - {player.losses}L)\n\n"
+                + ("\n".join(games_list) or "No games on this page")
+            )
+            embed.set_footer(
+                text=f"Page {page}"
+                + (f" - use page={page + 1} for older games" if has_next_page else "")
             )
+            head_to_head = await self.player_history.get_head_to_head(player.warzone_id)
+            if head_to_head:
+                embed.add_field(
+                    name="Most played opponents", value="\n".join(head_to_head)[0:1024]
+                )
+            if player.warzone_id in self.leaderboard:
+                rank = self.leaderboard.get_rank(player.warzone_id)
+                embed.add_field(
+                    name="Nearby players",
+                    value="\n".join(
+                        f"{rank + i + 1:2}. {neighbour.elo:.0f} - {neighbour.name}"
+                        for i, neighbour in enumerate(
+                            self.leaderboard.get_neighbours(player.warzone_id, 2),
+                            start=-min(rank, 2),
+                        )
+                    )[0:1024],
+                )
             await interaction.response.send_message(embed=embed)
         except Exception as e:
             log_exception(e)
@@ -303,6 +360,8 @@ class RTLCommands(WarzoneCog):
             if interaction.channel.id in self.config.rtl_channels:
                 self.config.rtl_channels.remove(interaction.channel.id)
                 self.config.save_rtl_channels()
+                self.config.rtl_roster_messages.pop(str(interaction.channel.id), None)
+                self.config.save_rtl_roster_messages()
                 log_message(
                     f"{interaction.user.name} ({interaction.user.id}) removed {interaction.channel.name} ({interaction.channel.id} - {interaction.guild.name}) from RTL updates.",
                     "RTL.remove_channel",
@@ -320,8 +379,12 @@ class RTLCommands(WarzoneCog):
     @app_commands.command(name="rtl_kill", description="Nothing to see here.")
     @commands.is_owner()
     async def rtl_kill(self, interaction: discord.Interaction):
+        self.is_killed = True
         job: Job = self.scheduler.get_job("RTL")
         job.pause()
+        # matchmaking runs in its own task, so pausing the job alone does not stop it
+        if self.matchmaking_task and not self.matchmaking_task.done():
+            self.matchmaking_task.cancel()
         log_message(
             f"{interaction.user.name} ({interaction.user.id}) killed the RTL engine process.",
             "RTL.kill",
@@ -334,8 +397,58 @@ class RTLCommands(WarzoneCog):
     ##### RTL engine #####
     ######################
 
+    def update_leaderboard(self, players: List[RTLPlayerModel]):
+        for player in players:
+            old_rank, new_rank = self.leaderboard.update(
+                LeaderboardEntry(
+                    player.warzone_id,
+                    player.name,
+                    player.elo,
+                    player.wins,
+                    player.losses,
+                )
+            )
+            if old_rank is None or min(old_rank, new_rank) < STANDINGS_SIZE:
+                self.standings_embed = None
+
+    def get_standings_embed(self) -> discord.Embed:
+        if self.standings_embed is None:
+            embed = discord.Embed(
+                title=f"JR17's real-time ladder - standings",
+            )
+            standings_list = []
+            for i, player in enumerate(self.leaderboard.get_top(STANDINGS_SIZE)):
+                standings_list.append(
+                    f"{i+1:2}. {player.elo:.0f} - [{player.name}](<https://www.warzone.com/Profile?p={player.id}>)  ({player.wins}W - {player.losses}L)"
+                )
+            embed.description = "\n".join(standings_list)
+            self.standings_embed = embed
+        return self.standings_embed
+
+    def request_roster_update(self):
+        """
+        Schedules a roster update ROSTER_UPDATE_DELAY seconds from now, unless one is already pending.
+
+        Changes made before the pending update queries the players are picked up by it, so a burst of joins/leaves produces
+        a single update. Changes made while it queries or publishes trigger one more update afterwards.
+        """
+        self.is_roster_update_requested = True
+        if self.roster_update_task and not self.roster_update_task.done():
+            return
+
+        async def delayed_roster_update():
+            while self.is_roster_update_requested:
+                await asyncio.sleep(ROSTER_UPDATE_DELAY)
+                self.is_roster_update_requested = False
+                try:
+                    await self.notify_active_players()
+                except Exception as e:
+                    log_exception(e)
+
+        self.roster_update_task = asyncio.create_task(delayed_roster_update())
+
     async def notify_active_players(self):
-        # Called whenever there is a change to active players on the RTL (added/removed)
+        # Called (through request_roster_update) whenever there is a change to active players on the RTL (added/removed)
         players = await RTLPlayerModel.filter(active=True).order_by("-elo").all()
 
         embed = discord.Embed(
@@ -358,16 +471,14 @@ class RTLCommands(WarzoneCog):
                 + "\n\n\* denotes player is currently in a game\n† denotes player is joined for a single game"
             )
 
-        for channel_id in self.config.rtl_channels:
-            try:
-                channel = self.bot.get_channel(channel_id)
-                await channel.send(embed=embed)
-            except Exception as e:
-                log_message(
-                    f"Failed sending message to {channel.name} in {channel.guild.name}",
-                    "notify_active_players",
-                )
-                log_exception(e)
+        # edit each channel's roster message rather than posting a new one per change
+        await self.broadcaster.publish(
+            self.config.rtl_channels,
+            self.config.rtl_roster_messages,
+            [embed],
+            "notify_active_players",
+        )
+        self.config.save_rtl_roster_messages()
 
     async def notify_new_game(self, game: RTLGameModel, template_name: str):
         player_a: RTLPlayerModel = game.player_a
@@ -384,23 +495,13 @@ class RTLCommands(WarzoneCog):
             ],
         )
 
-        discord_user_a = self.bot.get_user(player_a.discord_id)
-        await discord_user_a.send(embed=embed)
-        discord_user_b = self.bot.get_user(player_b.discord_id)
-        await discord_user_b.send(embed=embed)
-
-        for channel_id in self.config.rtl_channels:
-            channel = self.bot.get_channel(channel_id)
-            try:
-                await channel.send(embed=embed)
-            except Exception as e:
-                log_message(
-                    f"Failed sending message to {channel.name} in {channel.guild.name}",
-                    "notify_new_game",
-                )
-                log_exception(e)
+        # players are notified right away, channels get one batched message at the end of the tick
+        self.broadcaster.queue("new_games", embed)
+        await self.broadcaster.broadcast(
+            [], [embed], "notify_new_game", [player_a.discord_id, player_b.discord_id]
+        )
 
-    async def notify_finished_game(self, game: RTLGameModel):
+    def notify_finished_game(self, game: RTLGameModel):
         winner: RTLPlayerModel = (
             game.player_a if game.winner_id == game.player_a_id else game.player_b
         )
@@ -419,20 +520,11 @@ class RTLCommands(WarzoneCog):
             ],
         )
 
-        for channel_id in self.config.rtl_channels:
-            try:
-                channel = self.bot.get_channel(channel_id)
-                await channel.send(embed=embed)
-            except Exception as e:
-                log_message(
-                    f"Failed sending message to {channel.name} in {channel.guild.name}",
-                    "notify_finished_game",
-                )
-                log_exception(e)
+        # sent in one batched message per channel at the end of the tick
+        self.broadcaster.queue("finished_games", embed)
 
-    async def update_player_ratings(
-        self, winner: RTLPlayerModel, loser: RTLPlayerModel
-    ):
+    def update_player_ratings(self, winner: RTLPlayerModel, loser: RTLPlayerModel):
+        # only updates the instances, the caller persists them
         expected_score_winner = 1 / (1 + 10 ** ((loser.elo - winner.elo) / 400))
         expected_score_loser = 1 / (1 + 10 ** ((winner.elo - loser.elo) / 400))
         winner.elo += 32 * (1 - expected_score_winner)
@@ -442,176 +534,378 @@ class RTLCommands(WarzoneCog):
         winner.active = not winner.join_single_game
         loser.active = not loser.join_single_game
         winner.in_game = False
-        winner.in_game = False
-        await asyncio.gather(winner.save(), loser.save())
+        loser.in_game = False
         if winner.join_single_game or loser.join_single_game:
             return True
         return False
 
-    async def update_games(self):
-        active_games = (
-            await RTLGameModel.filter(ended=None)
-            .all()
-            .prefetch_related("player_a")
-            .prefetch_related("player_b")
+    async def poll_games(
+        self, games: List[RTLGameModel]
+    ) -> List[Tuple[RTLGameModel, WarzoneGame]]:
+        """
+        Fetches the current state of every game concurrently (bounded by MAX_CONCURRENT_GAME_POLLS).
+
+        Games that fail to be fetched are logged and left out, so they are retried next tick.
+        """
+        semaphore = asyncio.Semaphore(MAX_CONCURRENT_GAME_POLLS)
+
+        async def poll_game(game: RTLGameModel) -> WarzoneGame:
+            async with semaphore:
+                return await self.warzone_api.check_game(game.id)
+
+        results = await asyncio.gather(
+            *(poll_game(game) for game in games), return_exceptions=True
         )
-        for game in active_games:
-            warzone_game = self.warzone_api.check_game(game.id)
-            await game.fetch_related("player_a", "player_b")
-            if warzone_game.outcome == Game.Outcome.FINISHED:
-                # Game newly finished
-                winner = next(
-                    (
-                        player
-                        for player in warzone_game.players
-                        if player.outcome == WarzonePlayer.Outcome.WON
-                    ),
-                    None,
+        polled_games = []
+        for game, result in zip(games, results):
+            if isinstance(result, Exception):
+                log_message(
+                    f"Failed polling game {game.id}: {repr(result)}",
+                    "RTL.poll_games",
                 )
-                if winner:
-                    winner_player: RTLPlayerModel = (
-                        game.player_a
-                        if game.player_a.warzone_id == winner.id
-                        else game.player_b
-                    )
-                else:
-                    # Why VTE... randomly assign this
-                    winner_player = (
-                        game.player_a if bool(random.getrandbits(1)) else game.player_b
-                    )
-                    log_message(
-                        f"No winner found, defaulting to random winner: {winner_player.name.encode()} {winner_player.warzone_id}",
-                        "update_new_games",
-                    )
+            else:
+                polled_games.append((game, result))
+        return polled_games
+
+    async def update_games(self) -> int:
+        """
+        Polls the active games that are due and saves any results. Returns the number of games that finished.
+        """
+        active_game_ids = await RTLGameModel.filter(ended=None).values_list(
+            "id", flat=True
+        )
+        self.poll_scheduler.sync(active_game_ids)
+        due_game_ids = self.poll_scheduler.pop_due()
+        if not due_game_ids:
+            return 0
 
-                loser_player: RTLPlayerModel = (
-                    game.player_a
-                    if game.player_a.warzone_id != winner_player.warzone_id
-                    else game.player_b
-                )
-                has_changed_player_status = await self.update_player_ratings(
-                    winner_player, loser_player
-                )
-                game.winner_id = winner_player.warzone_id
-                game.ended = datetime.now()
+        active_games = await RTLGameModel.filter(id__in=due_game_ids).prefetch_related(
+            "player_a", "player_b"
+        )
+        # share a single instance per player, so players in several finished games get their ratings applied in order
+        players: Dict[int, RTLPlayerModel] = {}
+        for game in active_games:
+            game.player_a = players.setdefault(game.player_a_id, game.player_a)
+            game.player_b = players.setdefault(game.player_b_id, game.player_b)
+
+        poll_start = time.perf_counter()
+        polled_games = await self.poll_games(active_games)
+        log_message(
+            f"Polled {len(polled_games)}/{len(active_games)} due games ({len(active_game_ids)} active) in {time.perf_counter() - poll_start:.2f}s",
+            "RTL.update_games",
+        )
+
+        finished_games: List[RTLGameModel] = []
+        expired_games: List[RTLGameModel] = []
+        has_changed_player_status = False
+        for game, warzone_game in polled_games:
+            try:
+                result = self.get_game_result(game, warzone_game)
+            except Exception as e:
                 log_message(
-                    f"New game finished: {warzone_game.players[0].name.encode()} {warzone_game.players[0].outcome} v {warzone_game.players[1].name.encode()} {warzone_game.players[1].outcome} ({warzone_game.link})",
-                    "update_new_games",
+                    f"Failed updating game {game.id}",
+                    "RTL.update_games",
                 )
-                await game.save()
-                await self.notify_finished_game(game)
-                if has_changed_player_status:
-                    await self.notify_active_players()
-            elif (
-                warzone_game.outcome == Game.Outcome.WAITING_FOR_PLAYERS
-                and datetime.now(timezone.utc) - warzone_game.start_time
-                > timedelta(minutes=5)
-            ):
-                # Game has been in the join lobby for too long. Game will be deleted and appropriate winner selected according to algorithm:
-                # 1. Assign win to left player if they have joined, or are invited and the right player declined
-                # 2. Assign win to the right player if they have joined, or are invited and the left player declined
-                # 3. Randomly assign win if both players are invited, or declined
+                log_exception(e)
+                continue
+            if result is None:
+                self.poll_scheduler.record_poll(game.id, warzone_game)
+                continue
+
+            self.poll_scheduler.remove(game.id)
+            winner_player, loser_player, has_expired = result
+            has_changed_player_status |= self.update_player_ratings(
+                winner_player, loser_player
+            )
+            game.winner_id = winner_player.warzone_id
+            game.ended = datetime.now()
+            finished_games.append(game)
+            if has_expired:
+                expired_games.append(game)
+
+        if not finished_games:
+            return 0
+
+        # every rating and game change of the tick is written in a single transaction
+        changed_players = {
+            player.warzone_id: player
+            for game in finished_games
+            for player in (game.player_a, game.player_b)
+        }
+        async with in_transaction() as connection:
+            await RTLPlayerModel.bulk_update(
+                list(changed_players.values()),
+                fields=["elo", "wins", "losses", "active", "in_game"],
+                using_db=connection,
+            )
+            await RTLGameModel.bulk_update(
+                finished_games, fields=["winner_id", "ended"], using_db=connection
+            )
+        # the leaderboard and cached histories follow the database, so they are only updated once the transaction commits
+        self.update_leaderboard(list(changed_players.values()))
+        for player_id in changed_players:
+            self.player_history.invalidate(player_id)
+        log_message(
+            f"Saved {len(finished_games)} finished games and {len(changed_players)} players",
+            "RTL.update_games",
+        )
+
+        for game in finished_games:
+            self.notify_finished_game(game)
+        await self.broadcaster.flush(
+            "finished_games", self.config.rtl_channels, "notify_finished_game"
+        )
+
+        # games that expired in the join lobby are deleted once their result is saved
+        for game in expired_games:
+            try:
+                await self.warzone_api.delete_game(game.id)
+            except Exception as e:
                 log_message(
-                    f"New game passed join time: {warzone_game.players[0].name.encode()} {warzone_game.players[0].outcome} v {warzone_game.players[1].name.encode()} {warzone_game.players[1].outcome} ({warzone_game.link})",
-                    "update_new_games",
+                    f"Failed deleting expired game {game.id}",
+                    "RTL.update_games",
                 )
-                log_message(f"Storing end response: {warzone_game}")
-
-                if warzone_game.players[0].outcome == WarzonePlayer.Outcome.PLAYING or (
-                    warzone_game.players[0].outcome == WarzonePlayer.Outcome.INVITED
-                    and warzone_game.players[1].outcome
-                    == WarzonePlayer.Outcome.DECLINED
-                ):
-                    # first player won
-                    winner_id = warzone_game.players[0].id
-
-                elif warzone_game.players[
-                    1
-                ].outcome == WarzonePlayer.Outcome.PLAYING or (
-                    warzone_game.players[1].outcome == WarzonePlayer.Outcome.INVITED
-                    and warzone_game.players[0].outcome
-                    == WarzonePlayer.Outcome.DECLINED
-                ):
-                    # second player won
-                    winner_id = warzone_game.players[1].id
-                else:
-                    # Some weird combo where neither player accepted
-                    # Randomly assign winner
-                    winner_id = warzone_game.players[random.getrandbits(1)].id
-                    log_message(
-                        f"No winner found, defaulting to random winner: {winner_id}",
-                        "update_new_games",
-                    )
+                log_exception(e)
 
+        if has_changed_player_status:
+            self.request_roster_update()
+        return len(finished_games)
+
+    def get_game_result(
+        self, game: RTLGameModel, warzone_game: WarzoneGame
+    ) -> Tuple[RTLPlayerModel, RTLPlayerModel, bool] | None:
+        """
+        Returns the (winner, loser, expired) of a game that has ended, or None if it is still in progress.
+
+        `expired` is set for games that stayed in the join lobby for too long, which still need deleting on warzone.
+        """
+        if warzone_game.outcome == Game.Outcome.FINISHED:
+            # Game newly finished
+            winner = next(
+                (
+                    player
+                    for player in warzone_game.players
+                    if player.outcome == WarzonePlayer.Outcome.WON
+                ),
+                None,
+            )
+            if winner:
                 winner_player: RTLPlayerModel = (
                     game.player_a
-                    if winner_id == game.player_a.warzone_id
+                    if game.player_a.warzone_id == winner.id
                     else game.player_b
                 )
-                loser_player: RTLPlayerModel = (
-                    game.player_a
-                    if winner_id != game.player_a.warzone_id
-                    else game.player_b
+            else:
+                # Why VTE... randomly assign this
+                winner_player = (
+                    game.player_a if bool(random.getrandbits(1)) else game.player_b
                 )
-
-                # save game as completed and announce to servers
-                has_changed_player_status = await self.update_player_ratings(
-                    winner_player, loser_player
+                log_message(
+                    f"No winner found, defaulting to random winner: {winner_player.name} {winner_player.warzone_id}",
+                    "update_new_games",
                 )
-                game.winner_id = winner_player.warzone_id
-                game.ended = datetime.now()
-                await game.save()
-                await game.fetch_related("winner")
-                await self.notify_finished_game(game)
-
-                # delete the game
-                self.warzone_api.delete_game(game.id)
-                if has_changed_player_status:
-                    await self.notify_active_players()
 
-    async def create_games(self):
-        active_players = await RTLPlayerModel.filter(active=True, in_game=False).all()
-
-        pairs: List[Tuple[RTLPlayerModel, RTLPlayerModel]] = []
-        while len(active_players) > 1:
-            pairs.append([pop_random(active_players), pop_random(active_players)])
-
-        # create games
-        for pair in pairs:
-            template_id, template_name = random.choice(RTL_TEMPLATES)
+            loser_player: RTLPlayerModel = (
+                game.player_a
+                if game.player_a.warzone_id != winner_player.warzone_id
+                else game.player_b
+            )
+            log_message(
+                f"New game finished: {warzone_game.players[0].name} {warzone_game.players[0].outcome} v {warzone_game.players[1].name} {warzone_game.players[1].outcome} ({warzone_game.link})",
+                "update_new_games",
+            )
+            return winner_player, loser_player, False
+        elif warzone_game.outcome == Game.Outcome.WAITING_FOR_PLAYERS and datetime.now(
+            timezone.utc
+        ) - warzone_game.start_time > timedelta(minutes=5):
+            # Game has been in the join lobby for too long. Game will be deleted and appropriate winner selected according to algorithm:
+            # 1. Assign win to left player if they have joined, or are invited and the right player declined
+            # 2. Assign win to the right player if they have joined, or are invited and the left player declined
+            # 3. Randomly assign win if both players are invited, or declined
+            log_message(
+                f"New game passed join time: {warzone_game.players[0].name} {warzone_game.players[0].outcome} v {warzone_game.players[1].name} {warzone_game.players[1].outcome} ({warzone_game.link})",
+                "update_new_games",
+            )
+            log_message(f"Storing end response: {warzone_game}")
 
-            try:
-                game_id = self.warzone_api.create_game(
-                    [(pair[0].warzone_id, "1"), (pair[1].warzone_id, "2")],
-                    template_id,
-                    "JR17's real-time ladder",
-                    f"This game is a part of JustinR17's real-time ladder. Players have 5 minutes to join the game. \n\n{template_name}",
-                )
+            if warzone_game.players[0].outcome == WarzonePlayer.Outcome.PLAYING or (
+                warzone_game.players[0].outcome == WarzonePlayer.Outcome.INVITED
+                and warzone_game.players[1].outcome == WarzonePlayer.Outcome.DECLINED
+            ):
+                # first player won
+                winner_id = warzone_game.players[0].id
 
+            elif warzone_game.players[1].outcome == WarzonePlayer.Outcome.PLAYING or (
+                warzone_game.players[1].outcome == WarzonePlayer.Outcome.INVITED
+                and warzone_game.players[0].outcome == WarzonePlayer.Outcome.DECLINED
+            ):
+                # second player won
+                winner_id = warzone_game.players[1].id
+            else:
+                # Some weird combo where neither player accepted
+                # Randomly assign winner
+                winner_id = warzone_game.players[random.getrandbits(1)].id
                 log_message(
-                    f"Created new game between {pair[0].name} ({pair[0].warzone_id}) and {pair[1].name} ({pair[1].warzone_id}) on {template_name}. game link: {game_id}",
-                    "RTL.create_games",
+                    f"No winner found, defaulting to random winner: {winner_id}",
+                    "update_new_games",
                 )
+
+            winner_player: RTLPlayerModel = (
+                game.player_a
+                if winner_id == game.player_a.warzone_id
+                else game.player_b
+            )
+            loser_player: RTLPlayerModel = (
+                game.player_a
+                if winner_id != game.player_a.warzone_id
+                else game.player_b
+            )
+            return winner_player, loser_player, True
+        return None
+
+    async def get_recent_opponents(self, player_ids: List[int]) -> Dict[int, Set[int]]:
+        games = await RTLGameModel.filter(
+            Q(player_a_id__in=player_ids) | Q(player_b_id__in=player_ids),
+            created__gte=datetime.now() - REMATCH_LOOKBACK,
+        ).values_list("player_a_id", "player_b_id")
+        recent_opponents: Dict[int, Set[int]] = {}
+        for player_a_id, player_b_id in games:
+            recent_opponents.setdefault(player_a_id, set()).add(player_b_id)
+            recent_opponents.setdefault(player_b_id, set()).add(player_a_id)
+        return recent_opponents
+
+    async def create_pairs(self) -> List[Tuple[RTLPlayerModel, RTLPlayerModel]]:
+        active_players = await RTLPlayerModel.filter(active=True, in_game=False).all()
+        players_by_id = {player.warzone_id: player for player in active_players}
+
+        # track how long each player has been waiting so the matchmaker can widen their rating window
+        now = datetime.now()
+        self.queued_since = {
+            player_id: self.queued_since.get(player_id, now)
+            for player_id in players_by_id
+        }
+        queued_players = [
+            QueuedPlayer(
+                player.warzone_id, player.elo, self.queued_since[player.warzone_id]
+            )
+            for player in active_players
+        ]
+        recent_opponents = await self.get_recent_opponents(list(players_by_id))
+
+        pairs = []
+        for a, b in self.matchmaker.create_pairs(queued_players, recent_opponents, now):
+            self.queued_since.pop(a.id)
+            self.queued_since.pop(b.id)
+            pairs.append((players_by_id[a.id], players_by_id[b.id]))
+        return pairs
+
+    async def create_game(self, player_a: RTLPlayerModel, player_b: RTLPlayerModel):
+        template_id, template_name = random.choice(RTL_TEMPLATES)
+        game_id = await self.warzone_api.create_game(
+            [(player_a.warzone_id, "1"), (player_b.warzone_id, "2")],
+            template_id,
+            "JR17's real-time ladder",
+            f"This game is a part of JustinR17's real-time ladder. Players have 5 minutes to join the game. \n\n{template_name}",
+        )
+
+        log_message(
+            f"Created new game between {player_a.name} ({player_a.warzone_id}) and {player_b.name} ({player_b.warzone_id}) on {template_name}. game link: {game_id}",
+            "RTL.create_games",
+        )
+        try:
+            # the game row and in_game flags are written together so players are never marked in-game without a game
+            async with in_transaction() as connection:
                 new_game = await RTLGameModel.create(
                     id=int(game_id),
                     created=datetime.now(),
                     template=template_id,
-                    player_a_id=pair[0].warzone_id,
-                    player_b_id=pair[1].warzone_id,
-                )
-                await new_game.fetch_related("player_a", "player_b")
-                pair[0].in_game = True
-                pair[1].in_game = True
-                await asyncio.gather(pair[0].save(), pair[1].save())
-                await self.notify_new_game(new_game, template_name)
+                    player_a_id=player_a.warzone_id,
+                    player_b_id=player_b.warzone_id,
+                    using_db=connection,
+                )
+                await RTLPlayerModel.filter(
+                    warzone_id__in=[player_a.warzone_id, player_b.warzone_id]
+                ).using_db(connection).update(in_game=True)
+        except Exception:
+            # the ladder will never track the game, so remove it from warzone as well
+            try:
+                await self.warzone_api.delete_game(int(game_id))
             except Exception as e:
                 log_message(
-                    f"Failed creating a game between {pair[0].name} ({pair[0].warzone_id}) and {pair[1].name} ({pair[1].warzone_id})",
+                    f"Failed deleting untracked game {game_id}",
                     "RTL.create_games",
                 )
                 log_exception(e)
+            raise
+
+        self.poll_scheduler.add(new_game.id, self.poll_scheduler.lobby_interval)
+        player_a.in_game = True
+        player_b.in_game = True
+        new_game.player_a = player_a
+        new_game.player_b = player_b
+        await self.notify_new_game(new_game, template_name)
+
+    async def create_games(self):
+        pairs = await self.create_pairs()
+        semaphore = asyncio.Semaphore(MAX_CONCURRENT_GAME_CREATIONS)
+
+        async def create_game_for_pair(pair: Tuple[RTLPlayerModel, RTLPlayerModel]):
+            async with semaphore:
+                try:
+                    await self.create_game(*pair)
+                except Exception as e:
+                    log_message(
+                        f"Failed creating a game between {pair[0].name} ({pair[0].warzone_id}) and {pair[1].name} ({pair[1].warzone_id})",
+                        "RTL.create_games",
+                    )
+                    log_exception(e)
+
+        await asyncio.gather(*(create_game_for_pair(pair) for pair in pairs))
+
+        await self.broadcaster.flush(
+            "new_games", self.config.rtl_channels, "notify_new_game"
+        )
+
+    def request_matchmaking(self):
+        """
+        Runs matchmaking as soon as the engine is free. Requests made while it runs trigger one more round afterwards.
+        """
+        if self.is_killed:
+            return
+        self.is_matchmaking_requested = True
+        if self.matchmaking_task and not self.matchmaking_task.done():
+            return
+
+        async def run_matchmaking():
+            while self.is_matchmaking_requested and not self.is_killed:
+                self.is_matchmaking_requested = False
+                try:
+                    async with self.engine_lock:
+                        self.last_matchmaking = datetime.now()
+                        await self.create_games()
+                except Exception as e:
+                    log_exception(e)
+
+        self.matchmaking_task = asyncio.create_task(run_matchmaking())
 
     async def run_engine(self):
-        # runs every minute to check in-progress games, then create new games if possible
-        await self.update_games()
-        await self.create_games()
+        # runs every ENGINE_TICK_SECONDS to poll the games that are due, matchmaking runs if players may have been freed
+        if self.is_killed:
+            return
+        tick_start = time.perf_counter()
+        # every tick is exported, including the many that finish no games
+        with RTL_TICK_METRICS.track():
+            async with self.engine_lock:
+                finished_game_count = await self.update_games()
+            if (
+                finished_game_count
+                or datetime.now() - self.last_matchmaking >= MATCHMAKING_INTERVAL
+            ):
+                self.request_matchmaking()
+        tick_duration = time.perf_counter() - tick_start
+        self.tick_durations.append(tick_duration)
+        if finished_game_count:
+            log_message(
+                f"RTL tick took {tick_duration:.2f}s (avg {sum(self.tick_durations) / len(self.tick_durations):.2f}s, max {max(self.tick_durations):.2f}s over last {len(self.tick_durations)} ticks)",
+                "RTL.run_engine",
+            )
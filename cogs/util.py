@@ -9,9 +9,10 @@ from discord.ext import commands
 
 from _types import FullWarzoneGame, WarzoneCog
 from config import Config
+from jobs import InstrumentedScheduler
 from sheet import GoogleSheet
 from utils import log_exception, log_message
-from warzone_api import WarzoneAPI
+from warzone_api import AsyncWarzoneAPI
 
 
 class UtilCommands(WarzoneCog):
@@ -21,14 +22,14 @@ class UtilCommands(WarzoneCog):
         bot: commands.Bot,
         config: Config,
         scheduler: AsyncIOScheduler,
-        warzone_api: WarzoneAPI,
+        warzone_api: AsyncWarzoneAPI,
     ) -> None:
         self.bot = bot
         self.config = config
         self.warzone_api = warzone_api
+        self.scheduler: InstrumentedScheduler = scheduler
 
         log_message("Scheduled UtilCommands.engine", "bot")
-        # self.scheduler = scheduler
         # self.scheduler.add_job(
         #     self.run_engine,
         #     CronTrigger(hour="*", minute="25", second="0"),
@@ -87,7 +88,7 @@ class UtilCommands(WarzoneCog):
                 f"User: {interaction.user.name} ({interaction.user.id}) in {interaction.guild.name}. Creating custom game from {game_id} at turn {turn_number} with players {players}",
                 "util.util_custom_game",
             )
-            game = self.warzone_api.query_game_full(game_id)
+            game = await self.warzone_api.query_game_full(game_id)
             if not (0 <= turn_number <= game.round):
                 await interaction.response.send_message(
                     "Invalid turn number. Must be between 0 and max turn length in game."
@@ -100,7 +101,7 @@ class UtilCommands(WarzoneCog):
             if without_fog:
                 game.settings["Fog"] = "NoFog"
 
-            new_game_id = self.warzone_api.create_custom_scenario_game(
+            new_game_id = await self.warzone_api.create_custom_scenario_game(
                 [[player, f"{i}"] for i, player in enumerate(players.split(","))],
                 "JR17 - Custom Scenario Game",
                 f"This game was created by cloning {game_id} at turn {turn_number}.",
@@ -118,3 +119,22 @@ class UtilCommands(WarzoneCog):
             await interaction.response.send_message(
                 "An error occurred. Please contact justinr17 on discord or warzone with the time it happened."
             )
+
+    @app_commands.command(
+        name="util_jobs",
+        description="Shows run statistics of the scheduled engines. Only Justin can use this command.",
+    )
+    async def util_jobs(self, interaction: discord.Interaction):
+        try:
+            if not await self.bot.is_owner(interaction.user):
+                return await interaction.response.send_message(
+                    "Only the bot owner can use this command.", ephemeral=True
+                )
+            embed = discord.Embed(
+                title="Scheduled jobs",
+                description="\n\n".join(self.scheduler.get_summary())[0:4096]
+                or "No jobs scheduled",
+            )
+            await interaction.response.send_message(embed=embed, ephemeral=True)
+        except Exception as e:
+            log_exception(e)
@@ -1,4 +1,5 @@
-from typing import List
+import os
+from typing import Dict, List
 from dotenv import dotenv_values
 
 from utils import read_pickled_file, write_pickled_file
@@ -17,8 +18,21 @@ class Config:
 
         self.rtl_channels: List[int] = read_pickled_file("data/rtl_channels.json")
         self.rtl_templates: List[int] = read_pickled_file("data/rtl_templates.json")
+        # channel id (as a string) -> id of the active players roster message in that channel
+        self.rtl_roster_messages: Dict[str, int] = (
+            read_pickled_file("data/rtl_roster_messages.json")
+            if os.path.exists("data/rtl_roster_messages.json")
+            else {}
+        )
 
         self.cl_standings_channel: int = config["cl_standings_channel"]
 
+        # the metrics endpoint only listens locally unless configured otherwise
+        self.metrics_host: str = config.get("metrics_host", "127.0.0.1")
+        self.metrics_port: int = int(config.get("metrics_port", 9100))
+
     def save_rtl_channels(self):
         write_pickled_file("data/rtl_channels.json", self.rtl_channels)
+
+    def save_rtl_roster_messages(self):
+        write_pickled_file("data/rtl_roster_messages.json", self.rtl_roster_messages)
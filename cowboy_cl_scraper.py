@@ -1,62 +1,71 @@
-from datetime import datetime
+import asyncio
+import json
 import os
-from typing import List, Tuple
-from _types import FullWarzoneGame, WarzonePlayer
+from typing import Dict, List, Tuple
+from _types import FullWarzoneGame, WarzoneGame, WarzonePlayer
+from cl_columns import ClotGameColumns
+from cl_records import ClotGame, ClotGameLog
 from config import Config
-from utils import log_exception, log_message, read_pickled_file, write_pickled_file
-from warzone_api import WarzoneAPI
+from rate_limit import TokenBucket
+from utils import log_exception, log_message
+from warzone_api import AsyncWarzoneAPI, WarzoneAPI
 import sys
 import re
 
-
 config = Config()
 api = WarzoneAPI(config)
 
 
-class ClotGame:
-
-    def __init__(
-        self,
-        cl: str,
-        division: str,
-        template: str,
-        link: str,
-        players: List[WarzonePlayer],
-        winner: List[int],
-        start_time: datetime,
-        turn: int,
-    ):
-        self.cl: str = cl
-        self.division: str = division
-        self.template: str = template
-        self.link: str = link
-        self.players: List[WarzonePlayer] = players
-        self.winner: List[int] = winner
-        self.start_time: datetime = start_time
-        self.turn: int = turn
-
-    def __repr__(self) -> str:
-        output_str = " vs ".join([str(player) for player in sorted(self.players)])
-        output_str += f"\n\tCL: {self.cl}"
-        output_str += f"\n\tDivision: {self.division}"
-        output_str += f"\n\tTemplate: {self.template}"
-        output_str += f"\n\tWinner: {self.winner}"
-        output_str += f"\n\tStart time: {self.start_time}"
-        output_str += f"\n\tRound: {self.turn}"
-        output_str += f"\n\tLink: {self.link}"
-        return output_str
-
-
 def overwrite_index_seen(cl: str, index: int):
     with open(f"data/ccs_index_{cl}", "w") as f:
         f.write(f"{index}")
 
 
+# Number of consecutive game IDs handed to a worker at a time in `scrape_parallel`
+SHARD_SIZE = 10000
+# Number of IDs a worker scans before checkpointing its shard
+SHARD_CHECKPOINT_INTERVAL = 1000
+# Attempts made for a single ID before the worker gives up on its shard for this run
+MAX_QUERY_ATTEMPTS = 3
+
+
+def read_shard_checkpoint(cl: str, start: int, end: int) -> Dict[int, int]:
+    """
+    Returns a mapping of shard start index -> next index to scan in that shard.
+
+    Initialized from the legacy single `ccs_index_<CL>` file on the first parallel run so no IDs are scanned twice.
+    """
+    if os.path.exists(f"data/ccs_shards_{cl}.json"):
+        with open(f"data/ccs_shards_{cl}.json", "r") as f:
+            return {int(shard): index for shard, index in json.load(f).items()}
+
+    legacy_index = start
+    if os.path.exists(f"data/ccs_index_{cl}"):
+        with open(f"data/ccs_index_{cl}", "r") as f:
+            legacy_index = int(f.readlines()[0])
+    return {
+        shard: max(shard, min(legacy_index, shard + SHARD_SIZE, end))
+        for shard in range(start, end, SHARD_SIZE)
+    }
+
+
+def write_shard_checkpoint(cl: str, shards: Dict[int, int]):
+    # Write to a temp file first so a crash mid-write never corrupts the checkpoint
+    with open(f"data/ccs_shards_{cl}.json.tmp", "w") as f:
+        json.dump(shards, f)
+    os.replace(f"data/ccs_shards_{cl}.json.tmp", f"data/ccs_shards_{cl}.json")
+
+
+CL_BOT_DESCRIPTION = "This game has been created by the Clan League bot. If you fail to join it within 3 days, vote to end or decline, it will count as a loss"
+
+
+def title_matcher_CL9(game: WarzoneGame):
+    # Only the title is available from the lightweight GameFeed used when probing
+    return re.search(r"^CL9 ", game.title)
+
+
 def game_matcher_CL9(game: FullWarzoneGame):
-    return re.search(r"^CL9 ", game.title) and re.match(
-        "This game has been created by the Clan League bot. If you fail to join it within 3 days, vote to end or decline, it will count as a loss",
-        game.description,
-    )
+    return title_matcher_CL9(game) and re.match(CL_BOT_DESCRIPTION, game.description)
 
 
 def title_parser_CL9(game: FullWarzoneGame) -> Tuple[str, str, str]:
@@ -69,11 +78,12 @@ def title_parser_CL10(game: FullWarzoneGame) -> Tuple[str, str, str]:
     return m.group(1), "", m.group(2)
 
 
+def title_matcher_CL10(game: WarzoneGame):
+    return re.search(r"^CL10 ", game.title)
+
+
 def game_matcher_CL10(game: FullWarzoneGame):
-    return re.search(r"^CL10 ", game.title) and re.match(
-        "This game has been created by the Clan League bot. If you fail to join it within 3 days, vote to end or decline, it will count as a loss",
-        game.description,
-    )
+    return title_matcher_CL10(game) and re.match(CL_BOT_DESCRIPTION, game.description)
 
 
 def format_players_to_array(players: List[WarzonePlayer]):
@@ -96,46 +106,165 @@ WARZONE_GAME_INDEXES = {
     "CL9": {
         "start": 12820000,
         "end": 14500000,
+        "probe_matcher": title_matcher_CL9,
         "matcher": game_matcher_CL9,
         "parser": title_parser_CL9,
     },
     "CL10": {
         "start": 15350000,
         "end": 16900001,
+        "probe_matcher": title_matcher_CL10,
         "matcher": game_matcher_CL10,
         "parser": title_parser_CL10,
     },
 }
 
+
+def query_matching_game(game_id: int, cl_info: Dict) -> FullWarzoneGame | None:
+    """
+    Fetches the full settings and history of a game only if its lightweight GameFeed passes the CL title matcher.
+
+    Nearly every ID in the range is not a CL game, so this avoids the heavy request for almost all of them.
+    """
+    probe = api.probe_game(game_id)
+    if not probe or not cl_info["probe_matcher"](probe):
+        return None
+    game_data = api.query_game_full(game_id)
+    return game_data if game_data and cl_info["matcher"](game_data) else None
+
+
+async def scrape_parallel(
+    cl: str,
+    cl_info: Dict,
+    warzone_data: ClotGameLog,
+    workers: int,
+    requests_per_second: float,
+):
+    """
+    Scrapes the CL game ID range with a pool of concurrent workers sharing one rate limit.
+
+    The range is split into shards of SHARD_SIZE IDs; each worker scans one shard at a time and progress is checkpointed per shard,
+    so an interrupted run resumes every partially scanned shard exactly where it stopped.
+    """
+    async_api = AsyncWarzoneAPI(
+        config,
+        connection_limit_per_host=workers,
+        rate_limiter=TokenBucket(requests_per_second, workers),
+    )
+    end = cl_info["end"]
+    shards = read_shard_checkpoint(cl, cl_info["start"], end)
+    pending_shards: asyncio.Queue[int] = asyncio.Queue()
+    for shard, index in sorted(shards.items()):
+        if index < min(shard + SHARD_SIZE, end):
+            pending_shards.put_nowait(shard)
+
+    def save_progress():
+        # Results are flushed before the checkpoint so a crash can only cause IDs to be re-scanned, never lost
+        warzone_data.flush()
+        write_shard_checkpoint(cl, shards)
+        scanned = sum(index - shard for shard, index in shards.items())
+        finished = sum(
+            1
+            for shard, index in shards.items()
+            if index >= min(shard + SHARD_SIZE, end)
+        )
+        log_message(
+            f"Checkpointed with {finished}/{len(shards)} shards finished and found {warzone_data.count} matches. Progress: {scanned/(end-cl_info['start'])*100}",
+            f"CCS_{cl}",
+        )
+
+    async def query_matching_game_async(game_id: int) -> FullWarzoneGame | None:
+        # Async counterpart of the module level query_matching_game, retrying transient failures
+        for attempt in range(1, MAX_QUERY_ATTEMPTS + 1):
+            try:
+                probe = await async_api.probe_game(game_id)
+                if not probe or not cl_info["probe_matcher"](probe):
+                    return None
+                game_data = await async_api.query_game_full(game_id)
+                return (
+                    game_data if game_data and cl_info["matcher"](game_data) else None
+                )
+            except Exception:
+                if attempt == MAX_QUERY_ATTEMPTS:
+                    raise
+                await asyncio.sleep(2**attempt)
+
+    async def worker():
+        while not pending_shards.empty():
+            shard = pending_shards.get_nowait()
+            shard_end = min(shard + SHARD_SIZE, end)
+            try:
+                for i in range(shards[shard], shard_end):
+                    game_data = await query_matching_game_async(i)
+                    if game_data:
+                        groups = cl_info["parser"](game_data)
+                        warzone_data.append(
+                            ClotGame(
+                                *groups,
+                                game_data.link,
+                                game_data.players,
+                                game_data.winner,
+                                game_data.start_time,
+                                game_data.round,
+                            )
+                        )
+                    shards[shard] = i + 1
+                    if (i + 1 - shard) % SHARD_CHECKPOINT_INTERVAL == 0:
+                        save_progress()
+            except Exception as e:
+                # Leave the shard at its last scanned index so the next run resumes it
+                log_message(
+                    f"Stopped scanning shard {shard} at {shards[shard]}",
+                    f"CCS_{cl}",
+                )
+                log_exception(e)
+
+    try:
+        await asyncio.gather(*(worker() for _ in range(workers)))
+    finally:
+        save_progress()
+        await async_api.close()
+
+
 print("\n".join(sys.argv))
 if len(sys.argv) < 3:
-    raise "Invalid arguments provided. Expected `python3 cowboy_cl_scraper.py <CL9 | CL10> <scrape | parse>`"
+    raise Exception(
+        "Invalid arguments provided. Expected `python3 cowboy_cl_scraper.py <CL9 | CL10> <scrape | scrape_parallel [workers] [requests/s] | parse | export | stats>`"
+    )
 
 cl_info = WARZONE_GAME_INDEXES[sys.argv[1]]
 if os.path.exists(f"data/ccs_index_{sys.argv[1]}"):
     with open(f"data/ccs_index_{sys.argv[1]}", "r") as f:
         last_seen_index = int(f.readlines()[0])
-    warzone_data: List[ClotGame] = read_pickled_file(f"data/ccs_data_{sys.argv[1]}")
     print(f"here {last_seen_index=}")
 else:
     last_seen_index = cl_info["start"]
-    warzone_data: List[ClotGame] = []
+
+# Legacy pickles reference `__main__.ClotGame`, so they can only be decoded from this script
+ClotGameLog.migrate_pickled_games(
+    f"data/ccs_data_{sys.argv[1]}", f"data/ccs_records_{sys.argv[1]}.jsonl"
+)
+warzone_data = ClotGameLog(f"data/ccs_records_{sys.argv[1]}.jsonl")
 
 if sys.argv[2] == "scrape":
+    if os.path.exists(f"data/ccs_shards_{sys.argv[1]}.json"):
+        # ccs_index is not updated by parallel runs, so resuming from it would scan IDs again and duplicate records
+        raise Exception(
+            f"data/ccs_shards_{sys.argv[1]}.json exists, so this CL was scanned with `scrape_parallel`. Continue with `scrape_parallel`"
+        )
     try:
         for i in range(last_seen_index, cl_info["end"]):
             if i % 1000 == 0:
-                # Save entries every 1000 lines
+                # Checkpoint every 1000 lines
+                warzone_data.flush()
                 overwrite_index_seen(sys.argv[1], i)
-                write_pickled_file(f"data/ccs_data_{sys.argv[1]}", warzone_data)
-                time_str = "[" + datetime.now().isoformat() + "]".format(type)
                 log_message(
-                    f'Finished parsing {i=} and found {len(warzone_data)} matches. Progress: {(i-cl_info["start"])/(cl_info["end"]-cl_info["start"])*100}',
+                    f'Finished parsing {i=} and found {warzone_data.count} matches. Progress: {(i-cl_info["start"])/(cl_info["end"]-cl_info["start"])*100}',
                     f"CCS_{sys.argv[1]}",
                 )
 
-            game_data = api.query_game_full(i)
-            if game_data and cl_info["matcher"](game_data):
+            game_data = query_matching_game(i, cl_info)
+            if game_data:
                 groups = cl_info["parser"](game_data)
                 warzone_data.append(
                     ClotGame(
@@ -148,13 +277,23 @@ if sys.argv[2] == "scrape":
                     )
                 )
     except Exception as e:
+        warzone_data.flush()
         overwrite_index_seen(sys.argv[1], i)
-        write_pickled_file(f"data/ccs_data_{sys.argv[1]}", warzone_data)
         log_message(
             f'Finished parsing {i=}. Progress: {(i-cl_info["start"])/(cl_info["end"]-cl_info["start"])*100}',
             f"CCS_{sys.argv[1]}",
         )
         log_exception(e)
+elif sys.argv[2] == "scrape_parallel":
+    asyncio.run(
+        scrape_parallel(
+            sys.argv[1],
+            cl_info,
+            warzone_data,
+            int(sys.argv[3]) if len(sys.argv) > 3 else 8,
+            float(sys.argv[4]) if len(sys.argv) > 4 else 8,
+        )
+    )
 elif sys.argv[2] == "parse":
     lines_to_output = []
     for game in warzone_data:
@@ -176,3 +315,24 @@ elif sys.argv[2] == "parse":
         f.write(
             "\n".join(["\t".join([str(x) for x in line]) for line in lines_to_output])
         )
+elif sys.argv[2] == "export":
+    ClotGameColumns.from_games(sys.argv[1], warzone_data).write(
+        f"data/ccs_columns_{sys.argv[1]}.bin"
+    )
+elif sys.argv[2] == "stats":
+    columns = ClotGameColumns.read(f"data/ccs_columns_{sys.argv[1]}.bin")
+    print(f"{columns.game_count()} games")
+    for division in columns.divisions:
+        records = columns.player_records(division)
+        top_players = sorted(
+            records.items(), key=lambda x: (x[1][0], -x[1][1]), reverse=True
+        )[:5]
+        print(
+            f"{division or sys.argv[1]}: "
+            + ", ".join(
+                f"{columns.player_name(player)} ({wins}W - {losses}L)"
+                for player, (wins, losses) in top_players
+            )
+        )
+
+warzone_data.close()
@@ -1,10 +1,40 @@
+from typing import Any, Dict
+
 from tortoise import Tortoise, fields, Model
 
+DB_FILE = "db.sqlite3"
+
+
+def get_db_config(file_path: str = DB_FILE) -> Dict[str, Any]:
+    """
+    Tortoise configuration for the bot's SQLite database. Every extra credential is applied as a PRAGMA on connect.
+
+    WAL lets reads proceed while the RTL engine writes, and synchronous=NORMAL only fsyncs on WAL checkpoints,
+    which is durable across application crashes (a power loss can roll back the last transactions).
+    """
+    return {
+        "connections": {
+            "default": {
+                # the stock SQLite engine, with query metrics
+                "engine": "db_client",
+                "credentials": {
+                    "file_path": file_path,
+                    "journal_mode": "WAL",
+                    "synchronous": "NORMAL",
+                    # negative values are in KiB, so 64 MiB of page cache
+                    "cache_size": -64000,
+                    "temp_store": "MEMORY",
+                },
+            }
+        },
+        "apps": {"models": {"models": ["database"], "default_connection": "default"}},
+    }
+
 
 class RTLPlayerModel(Model):
     warzone_id = fields.IntField(primary_key=True)
     name = fields.TextField()
-    discord_id = fields.IntField()
+    discord_id = fields.IntField(db_index=True)
     active = fields.BooleanField(default=False)
     join_single_game = fields.BooleanField(default=False)
     in_game = fields.BooleanField(default=False)
@@ -12,11 +42,15 @@ class RTLPlayerModel(Model):
     losses = fields.IntField(default=0)
     elo = fields.FloatField(default=1500)
 
+    class Meta:
+        # matchmaking queue: filter(active=True, in_game=False)
+        indexes = (("active", "in_game"),)
+
 
 class RTLGameModel(Model):
     id = fields.IntField(primary_key=True)
     created = fields.DatetimeField()
-    ended = fields.DatetimeField(null=True)
+    ended = fields.DatetimeField(null=True, db_index=True)
     template = fields.IntField()
     player_a = fields.ForeignKeyField("models.RTLPlayerModel", related_name=False)
     player_b = fields.ForeignKeyField("models.RTLPlayerModel", related_name=False)
@@ -24,6 +58,10 @@ class RTLGameModel(Model):
         "models.RTLPlayerModel", related_name=False, null=True
     )
 
+    class Meta:
+        # player history: (player_a | player_b) ordered by ended
+        indexes = (("player_a", "ended"), ("player_b", "ended"))
+
 
 class ClotPlayer(Model):
     warzone_id = fields.IntField(primary_key=True)
@@ -40,7 +78,7 @@ class MTLChannel(Model):
     message_id = fields.IntField()
 
 
-async def init():
-    await Tortoise.init(db_url="sqlite://db.sqlite3", modules={"models": ["database"]})
+async def init(file_path: str = DB_FILE):
+    await Tortoise.init(config=get_db_config(file_path))
     # Generate the schema
     await Tortoise.generate_schemas()
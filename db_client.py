@@ -0,0 +1,59 @@
+# Tortoise engine module for the bot's SQLite database: the stock SQLite client with every query timed in metrics.DB_METRICS
+from typing import List, Optional
+
+from tortoise.backends.base.client import TransactionContext
+from tortoise.backends.sqlite.client import SqliteClient, TransactionWrapper
+
+from metrics import DB_METRICS
+
+
+def get_operation(query: str) -> str:
+    operation = query.lstrip().split(" ", 1)[0].lower()
+    return (
+        operation
+        if operation in ["select", "insert", "update", "delete", "create"]
+        else "other"
+    )
+
+
+class InstrumentedClientMixin:
+    """
+    Times every query, including the wait for the connection lock, since that is what the caller experiences.
+    """
+
+    async def execute_insert(self, query: str, values: list) -> int:
+        with DB_METRICS.track("insert"):
+            return await super().execute_insert(query, values)
+
+    async def execute_many(self, query: str, values: List[list]) -> None:
+        with DB_METRICS.track(get_operation(query)):
+            return await super().execute_many(query, values)
+
+    async def execute_query(self, query: str, values: Optional[list] = None):
+        with DB_METRICS.track(get_operation(query)):
+            return await super().execute_query(query, values)
+
+    async def execute_query_dict(self, query: str, values: Optional[list] = None):
+        with DB_METRICS.track(get_operation(query)):
+            return await super().execute_query_dict(query, values)
+
+    async def execute_script(self, query: str) -> None:
+        with DB_METRICS.track("script"):
+            return await super().execute_script(query)
+
+
+class InstrumentedTransactionWrapper(InstrumentedClientMixin, TransactionWrapper):
+
+    async def commit(self) -> None:
+        with DB_METRICS.track("commit"):
+            return await super().commit()
+
+
+class InstrumentedSqliteClient(InstrumentedClientMixin, SqliteClient):
+
+    def _in_transaction(self) -> TransactionContext:
+        return TransactionContext(InstrumentedTransactionWrapper(self))
+
+
+# Looked up by Tortoise when this module is used as an engine
+client_class = InstrumentedSqliteClient
@@ -0,0 +1,150 @@
+from datetime import datetime
+import inspect
+import time
+from typing import Callable, Dict, List, Set
+
+from apscheduler.events import EVENT_JOB_MAX_INSTANCES, EVENT_JOB_MISSED, JobEvent
+from apscheduler.job import Job
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
+
+from metrics import Histogram, format_labels
+from utils import log_exception, log_message
+
+
+class JobStats:
+
+    def __init__(self):
+        self.durations = Histogram()
+        self.runs = 0
+        self.failures = 0
+        # runs not started because the previous run was still in progress
+        self.skipped = 0
+        # runs not started in time (e.g. the event loop was blocked past the misfire grace time)
+        self.misfires = 0
+        self.max_duration = 0.0
+        self.last_duration: float | None = None
+        self.last_run: datetime | None = None
+        self.last_error: str | None = None
+        self.last_error_time: datetime | None = None
+
+
+class InstrumentedScheduler(AsyncIOScheduler):
+    """
+    AsyncIOScheduler that runs every job single-flight and records its run times, skips, misfires and last error.
+
+    Jobs are identified by their name, so cogs can look them up with `get_job(name)`. A run that is due while the previous
+    run of the same job is still in progress is skipped, so an overrunning engine never runs concurrently with itself.
+    """
+
+    def __init__(self, **options):
+        options.setdefault(
+            "job_defaults",
+            {"coalesce": True, "max_instances": 1, "misfire_grace_time": 30},
+        )
+        super().__init__(**options)
+        self.job_stats: Dict[str, JobStats] = {}
+        self.running_jobs: Set[str] = set()
+        self.add_listener(self.on_job_event, EVENT_JOB_MISSED | EVENT_JOB_MAX_INSTANCES)
+
+    def add_job(
+        self,
+        func: Callable,
+        trigger=None,
+        args=None,
+        kwargs=None,
+        id=None,
+        name=None,
+        **options,
+    ) -> Job:
+        job_id = id or name or func.__name__
+        self.job_stats.setdefault(job_id, JobStats())
+        return super().add_job(
+            self.instrument(job_id, func),
+            trigger,
+            args,
+            kwargs,
+            id=job_id,
+            name=name or job_id,
+            **options,
+        )
+
+    def instrument(self, job_id: str, func: Callable) -> Callable:
+        async def run_job(*args, **kwargs):
+            stats = self.job_stats[job_id]
+            if job_id in self.running_jobs:
+                stats.skipped += 1
+                log_message(
+                    f"Skipped {job_id}: the previous run is still in progress", "jobs"
+                )
+                return
+
+            self.running_jobs.add(job_id)
+            start = time.perf_counter()
+            try:
+                result = func(*args, **kwargs)
+                if inspect.isawaitable(result):
+                    await result
+            except Exception as e:
+                stats.failures += 1
+                stats.last_error = repr(e)
+                stats.last_error_time = datetime.now()
+                log_message(f"{job_id} failed: {repr(e)}", "jobs")
+                log_exception(e)
+            finally:
+                self.running_jobs.discard(job_id)
+                duration = time.perf_counter() - start
+                stats.runs += 1
+                stats.durations.observe(duration)
+                stats.max_duration = max(stats.max_duration, duration)
+                stats.last_duration = duration
+                stats.last_run = datetime.now()
+
+        run_job.__name__ = getattr(func, "__name__", job_id)
+        return run_job
+
+    def on_job_event(self, event: JobEvent):
+        stats = self.job_stats.setdefault(event.job_id, JobStats())
+        if event.code == EVENT_JOB_MISSED:
+            stats.misfires += 1
+            log_message(f"{event.job_id} misfired", "jobs")
+        elif event.code == EVENT_JOB_MAX_INSTANCES:
+            stats.skipped += 1
+
+    def get_summary(self) -> List[str]:
+        lines = []
+        for job_id, stats in self.job_stats.items():
+            average = stats.durations.sum / stats.runs if stats.runs else 0
+            line = f"**{job_id}**: {stats.runs} runs, avg {average:.2f}s, p95 ≤{stats.durations.get_quantile(0.95):g}s, max {stats.max_duration:.2f}s | {stats.failures} failed, {stats.skipped} skipped, {stats.misfires} misfired"
+            if stats.last_error:
+                line += f"\nLast error ({stats.last_error_time:%Y-%m-%d %H:%M:%S}): `{stats.last_error[0:200]}`"
+            lines.append(line)
+        return lines
+
+    def render_metrics(self) -> List[str]:
+        lines = [
+            "# TYPE scheduler_job_duration_seconds histogram",
+        ]
+        for job_id, stats in self.job_stats.items():
+            lines.extend(
+                stats.durations.render(
+                    "scheduler_job_duration_seconds", {"job": job_id}
+                )
+            )
+        for metric, attribute in [
+            ("scheduler_job_runs_total", "runs"),
+            ("scheduler_job_failures_total", "failures"),
+            ("scheduler_job_skipped_total", "skipped"),
+            ("scheduler_job_misfires_total", "misfires"),
+        ]:
+            lines.append(f"# TYPE {metric} counter")
+            for job_id, stats in self.job_stats.items():
+                lines.append(
+                    f"{metric}{format_labels({'job': job_id})} {getattr(stats, attribute)}"
+                )
+        lines.append("# TYPE scheduler_job_last_error_timestamp_seconds gauge")
+        for job_id, stats in self.job_stats.items():
+            if stats.last_error_time:
+                lines.append(
+                    f"scheduler_job_last_error_timestamp_seconds{format_labels({'job': job_id})} {stats.last_error_time.timestamp():.0f}"
+                )
+        return lines
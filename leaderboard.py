@@ -0,0 +1,176 @@
+import random
+from typing import Any, Dict, List, Tuple
+
+
+class SkipListNode:
+    __slots__ = ("key", "next", "width")
+
+    def __init__(self, key: Any, level: int):
+        self.key = key
+        self.next: List["SkipListNode | None"] = [None] * level
+        # number of level 0 steps from this node to `next[level]`
+        self.width: List[int] = [1] * level
+
+
+class IndexableSkipList:
+    """
+    Sorted collection of unique keys supporting insert, remove, rank and lookup by index in O(log n) expected time.
+
+    Every link stores how many elements it skips, so positions are summed while searching instead of counted afterwards.
+    """
+
+    MAX_LEVELS = 32
+
+    def __init__(self):
+        self.head = SkipListNode(None, IndexableSkipList.MAX_LEVELS)
+        self.size = 0
+
+    def __len__(self) -> int:
+        return self.size
+
+    def find_path(self, key: Any) -> Tuple[List[SkipListNode], List[int]]:
+        """
+        Returns, per level, the last node before `key` and the number of elements skipped at that level to reach it.
+        """
+        path: List[SkipListNode] = [self.head] * IndexableSkipList.MAX_LEVELS
+        steps = [0] * IndexableSkipList.MAX_LEVELS
+        node = self.head
+        for level in reversed(range(IndexableSkipList.MAX_LEVELS)):
+            while node.next[level] is not None and node.next[level].key < key:
+                steps[level] += node.width[level]
+                node = node.next[level]
+            path[level] = node
+        return path, steps
+
+    def insert(self, key: Any):
+        path, steps = self.find_path(key)
+        level = 1
+        while level < IndexableSkipList.MAX_LEVELS and random.random() < 0.5:
+            level += 1
+
+        node = SkipListNode(key, level)
+        skipped = 0
+        for i in range(level):
+            previous = path[i]
+            node.next[i] = previous.next[i]
+            previous.next[i] = node
+            node.width[i] = previous.width[i] - skipped
+            previous.width[i] = skipped + 1
+            skipped += steps[i]
+        for i in range(level, IndexableSkipList.MAX_LEVELS):
+            path[i].width[i] += 1
+        self.size += 1
+
+    def remove(self, key: Any):
+        path, _ = self.find_path(key)
+        node = path[0].next[0]
+        if node is None or node.key != key:
+            raise KeyError(key)
+        for i in range(len(node.next)):
+            path[i].width[i] += node.width[i] - 1
+            path[i].next[i] = node.next[i]
+        for i in range(len(node.next), IndexableSkipList.MAX_LEVELS):
+            path[i].width[i] -= 1
+        self.size -= 1
+
+    def get_rank(self, key: Any) -> int:
+        """
+        Returns the number of keys smaller than `key`, which is its 0-based index if it is in the list.
+        """
+        _, steps = self.find_path(key)
+        return sum(steps)
+
+    def get_node(self, index: int) -> SkipListNode | None:
+        # the head is position 0, so the element at `index` is position index + 1
+        position = index + 1
+        node = self.head
+        for level in reversed(range(IndexableSkipList.MAX_LEVELS)):
+            while node.next[level] is not None and node.width[level] <= position:
+                position -= node.width[level]
+                node = node.next[level]
+        return node if node is not self.head else None
+
+    def get_range(self, start: int, end: int) -> List[Any]:
+        start = max(0, start)
+        end = min(end, self.size)
+        if start >= end:
+            return []
+        keys = []
+        node = self.get_node(start)
+        while node is not None and len(keys) < end - start:
+            keys.append(node.key)
+            node = node.next[0]
+        return keys
+
+
+class LeaderboardEntry:
+
+    def __init__(self, id: int, name: str, elo: float, wins: int, losses: int):
+        self.id = id
+        self.name = name
+        self.elo = elo
+        self.wins = wins
+        self.losses = losses
+
+    def get_key(self) -> Tuple[float, int]:
+        # highest Elo first, ties broken by ID so every key is unique
+        return -self.elo, self.id
+
+    def __repr__(self) -> str:
+        return f"{self.name} ({self.elo:.0f})"
+
+
+class Leaderboard:
+    """
+    In-memory ranking of players by Elo.
+
+    Entries are kept in an indexable skip list ordered by `(-elo, id)`, so updating a player, finding their rank and
+    reading the top N or a player's neighbours are all O(log n) (plus the number of entries read).
+    """
+
+    def __init__(self):
+        self.keys = IndexableSkipList()
+        self.entries: Dict[int, LeaderboardEntry] = {}
+
+    def load(self, entries: List[LeaderboardEntry]):
+        self.entries = {entry.id: entry for entry in entries}
+        self.keys = IndexableSkipList()
+        for entry in entries:
+            self.keys.insert(entry.get_key())
+
+    def update(self, entry: LeaderboardEntry) -> Tuple[int | None, int]:
+        """
+        Adds or replaces the player's entry. Returns the player's previous rank (None if they were not ranked) and new rank.
+        """
+        old_rank = None
+        if entry.id in self.entries:
+            old_rank = self.get_rank(entry.id)
+            self.keys.remove(self.entries[entry.id].get_key())
+        self.entries[entry.id] = entry
+        self.keys.insert(entry.get_key())
+        return old_rank, self.get_rank(entry.id)
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def __contains__(self, id: int) -> bool:
+        return id in self.entries
+
+    def get_rank(self, id: int) -> int:
+        """
+        Returns the 0-based rank of the player. Raises KeyError if the player is not on the leaderboard.
+        """
+        return self.keys.get_rank(self.entries[id].get_key())
+
+    def get_range(self, start: int, end: int) -> List[LeaderboardEntry]:
+        return [self.entries[id] for _, id in self.keys.get_range(start, end)]
+
+    def get_top(self, count: int) -> List[LeaderboardEntry]:
+        return self.get_range(0, count)
+
+    def get_neighbours(self, id: int, count: int) -> List[LeaderboardEntry]:
+        """
+        Returns the player's entry with up to `count` players ranked directly above and below them.
+        """
+        rank = self.get_rank(id)
+        return self.get_range(rank - count, rank + count + 1)
@@ -6,12 +6,13 @@ from cogs.cl import CLCommands
 from cogs.mtl import MTLCommands
 from cogs.rtl import RTLCommands
 import discord
-from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from discord.ext import commands
 from cogs.util import UtilCommands
 from config import Config
 from database import init
-from warzone_api import WarzoneAPI
+from jobs import InstrumentedScheduler
+from metrics import MetricsServer, render_operation_metrics
+from warzone_api import AsyncWarzoneAPI
 
 intents = discord.Intents.default()
 intents.members = True
@@ -40,8 +41,13 @@ class WarzoneBot(commands.Bot):
         super().__init__(command_prefix="jr!", intents=intents, **options)
         self.config = Config()
         self.has_loaded_cogs = False
-        self.scheduler = AsyncIOScheduler()
-        self.warzone_api = WarzoneAPI(self.config)
+        self.scheduler = InstrumentedScheduler()
+        self.warzone_api = AsyncWarzoneAPI(self.config)
+        self.metrics_server = MetricsServer(
+            self.config.metrics_host, self.config.metrics_port
+        )
+        self.metrics_server.add_collector(self.scheduler.render_metrics)
+        self.metrics_server.add_collector(render_operation_metrics)
         self.run(self.config.discord_token)
 
     @commands.command(name="sync")
@@ -50,6 +56,11 @@ class WarzoneBot(commands.Bot):
         print(f"Synced {len(synced)} command(s).")
         await ctx.send(f"Synced {len(synced)} command(s).")
 
+    async def close(self):
+        await self.metrics_server.close()
+        await self.warzone_api.close()
+        await super().close()
+
     async def on_ready(self):
         # Add each individual cog to the bot
         # The __init__ should add jobs if scheduler required
@@ -60,6 +71,7 @@ class WarzoneBot(commands.Bot):
                     cog(self, self.config, self.scheduler, self.warzone_api)
                 )
             self.scheduler.start()
+            await self.metrics_server.start()
             synced = await self.tree.sync()
             print(f"Synced {len(synced)} command(s).")
             self.has_loaded_cogs = True
@@ -0,0 +1,130 @@
+from abc import ABC, abstractmethod
+from datetime import datetime
+import random
+from typing import Dict, List, Set, Tuple
+
+
+class QueuedPlayer:
+
+    def __init__(self, id: int, elo: float, queued_since: datetime):
+        self.id = id
+        self.elo = elo
+        self.queued_since = queued_since
+
+    def __repr__(self) -> str:
+        return f"{self.id} ({self.elo:.0f})"
+
+
+class Matchmaker(ABC):
+    """
+    Base class of the RTL matchmaking engines.
+
+    `create_pairs` receives the queued players and each player's recent opponents, and returns the pairs to create games for.
+    Players left out of every pair stay queued for the next round.
+    """
+
+    @abstractmethod
+    def create_pairs(
+        self,
+        players: List[QueuedPlayer],
+        recent_opponents: Dict[int, Set[int]],
+        now: datetime,
+    ) -> List[Tuple[QueuedPlayer, QueuedPlayer]]:
+        pass
+
+
+class RandomMatchmaker(Matchmaker):
+    """
+    Pairs players at random, ignoring rating and history.
+    """
+
+    def create_pairs(
+        self,
+        players: List[QueuedPlayer],
+        recent_opponents: Dict[int, Set[int]],
+        now: datetime,
+    ) -> List[Tuple[QueuedPlayer, QueuedPlayer]]:
+        players = random.sample(players, len(players))
+        return [(players[i], players[i + 1]) for i in range(0, len(players) - 1, 2)]
+
+
+class EloWindowMatchmaker(Matchmaker):
+    """
+    Pairs players of similar rating.
+
+    A player accepts opponents within `base_window` Elo, widening by `window_growth_per_minute` while they wait, up to `max_window`.
+    Players are sorted by Elo, then a linear-time DP picks the pairing that matches the most players at the lowest total cost.
+    Only neighbours within blocks of up to four sorted players are considered. The cost of a pair is its Elo difference,
+    plus `rematch_penalty` if the players recently played each other. Overall the engine is O(n log n).
+    """
+
+    def __init__(
+        self,
+        base_window: float = 100,
+        window_growth_per_minute: float = 50,
+        max_window: float = 800,
+        rematch_penalty: float = 400,
+    ):
+        self.base_window = base_window
+        self.window_growth_per_minute = window_growth_per_minute
+        self.max_window = max_window
+        self.rematch_penalty = rematch_penalty
+        # Leaving a player unpaired costs more than any allowed pair, so the DP always maximizes the number of pairs first
+        self.unpaired_cost = max_window + rematch_penalty + 1
+
+    def get_window(self, player: QueuedPlayer, now: datetime) -> float:
+        minutes_waiting = max(0, (now - player.queued_since).total_seconds() / 60)
+        return min(
+            self.max_window,
+            self.base_window + self.window_growth_per_minute * minutes_waiting,
+        )
+
+    def create_pairs(
+        self,
+        players: List[QueuedPlayer],
+        recent_opponents: Dict[int, Set[int]],
+        now: datetime,
+    ) -> List[Tuple[QueuedPlayer, QueuedPlayer]]:
+        players = sorted(players, key=lambda player: player.elo)
+        windows = [self.get_window(player, now) for player in players]
+        no_pair = float("inf")
+
+        def pair_cost(a: int, b: int) -> float:
+            difference = abs(players[a].elo - players[b].elo)
+            if difference > max(windows[a], windows[b]):
+                return no_pair
+            if players[b].id in recent_opponents.get(players[a].id, set()):
+                difference += self.rematch_penalty
+            return difference
+
+        # cost[i] is the lowest cost of matching the first i players, choice[i] the pairs used for the last step
+        cost: List[float] = [0.0] + [no_pair] * len(players)
+        choice: List[List[Tuple[int, int]]] = [[] for _ in range(len(players) + 1)]
+        for i in range(1, len(players) + 1):
+            # leave player i - 1 unpaired
+            cost[i] = cost[i - 1] + self.unpaired_cost
+            choice[i] = []
+            candidates: List[List[Tuple[int, int]]] = []
+            if i >= 2:
+                candidates.append([(i - 2, i - 1)])
+            if i >= 4:
+                # crossed and nested pairs within a block of four let neighbours avoid a rematch
+                candidates.append([(i - 4, i - 2), (i - 3, i - 1)])
+                candidates.append([(i - 4, i - 1), (i - 3, i - 2)])
+            for pairs in candidates:
+                total = cost[i - 2 * len(pairs)] + sum(
+                    pair_cost(a, b) for a, b in pairs
+                )
+                if total < cost[i]:
+                    cost[i] = total
+                    choice[i] = pairs
+
+        result: List[Tuple[QueuedPlayer, QueuedPlayer]] = []
+        i = len(players)
+        while i > 0:
+            if choice[i]:
+                result.extend((players[a], players[b]) for a, b in choice[i])
+                i -= 2 * len(choice[i])
+            else:
+                i -= 1
+        return result
@@ -0,0 +1,244 @@
+from bisect import bisect_left
+from contextlib import contextmanager
+import time
+from typing import Callable, Dict, List, Tuple
+
+from aiohttp import web
+
+from utils import log_message
+
+# Upper bounds (in seconds) of the duration histogram buckets
+DEFAULT_BUCKETS: Tuple[float, ...] = (
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1,
+    2.5,
+    5,
+    10,
+    30,
+    60,
+    120,
+    float("inf"),
+)
+
+
+def escape_label_value(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def format_labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    return (
+        "{"
+        + ",".join(
+            f'{key}="{escape_label_value(value)}"' for key, value in labels.items()
+        )
+        + "}"
+    )
+
+
+class Histogram:
+    """
+    Cumulative histogram in the Prometheus style: a count per bucket upper bound, plus the total count and sum.
+    """
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts: List[int] = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def get_quantile(self, quantile: float) -> float:
+        """
+        Returns the upper bound of the bucket containing the quantile, which is an upper estimate of it.
+        """
+        target = quantile * self.count
+        seen = 0
+        for bucket, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= target:
+                return bucket
+        return float("inf")
+
+    def render(self, name: str, labels: dict) -> List[str]:
+        lines = []
+        seen = 0
+        for bucket, count in zip(self.buckets, self.counts):
+            seen += count
+            bound = "+Inf" if bucket == float("inf") else f"{bucket:g}"
+            lines.append(
+                f"{name}_bucket{format_labels({**labels, 'le': bound})} {seen}"
+            )
+        lines.append(f"{name}_count{format_labels(labels)} {self.count}")
+        lines.append(f"{name}_sum{format_labels(labels)} {self.sum:.6f}")
+        return lines
+
+
+class Counter:
+
+    def __init__(self, name: str, description: str, label_names: List[str]):
+        self.name = name
+        self.description = description
+        self.label_names = label_names
+        self.values: Dict[Tuple, float] = {}
+
+    def inc(self, labels: Tuple, amount: float = 1):
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [
+            f"# HELP {self.name} {self.description}",
+            f"# TYPE {self.name} counter",
+        ]
+        for labels, value in self.values.items():
+            lines.append(
+                f"{self.name}{format_labels(dict(zip(self.label_names, labels)))} {value:g}"
+            )
+        return lines
+
+
+class HistogramFamily:
+    """
+    One Histogram per combination of label values.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        description: str,
+        label_names: List[str],
+        buckets: Tuple[float, ...] = DEFAULT_BUCKETS,
+    ):
+        self.name = name
+        self.description = description
+        self.label_names = label_names
+        self.buckets = buckets
+        self.histograms: Dict[Tuple, Histogram] = {}
+
+    def observe(self, labels: Tuple, value: float):
+        if labels not in self.histograms:
+            self.histograms[labels] = Histogram(self.buckets)
+        self.histograms[labels].observe(value)
+
+    def render(self) -> List[str]:
+        lines = [
+            f"# HELP {self.name} {self.description}",
+            f"# TYPE {self.name} histogram",
+        ]
+        for labels, histogram in self.histograms.items():
+            lines.extend(
+                histogram.render(self.name, dict(zip(self.label_names, labels)))
+            )
+        return lines
+
+
+class OperationMetrics:
+    """
+    Counts calls of an operation by outcome ("ok" or "error") and records their latency, e.g. requests to an external API.
+    """
+
+    def __init__(self, name: str, description: str, label_names: List[str]):
+        # e.g. name "db_query" gives db_query_total and db_query_duration_seconds
+        self.calls = Counter(
+            f"{name}_total", f"{description} by outcome", label_names + ["outcome"]
+        )
+        self.durations = HistogramFamily(
+            f"{name}_duration_seconds", f"Duration of {description}", label_names
+        )
+
+    @contextmanager
+    def track(self, *labels: str):
+        start = time.perf_counter()
+        outcome = "ok"
+        try:
+            yield
+        except BaseException:
+            outcome = "error"
+            raise
+        finally:
+            self.durations.observe(labels, time.perf_counter() - start)
+            self.calls.inc(labels + (outcome,))
+
+    def render(self) -> List[str]:
+        return self.calls.render() + self.durations.render()
+
+
+WARZONE_API_METRICS = OperationMetrics(
+    "warzone_api_request", "Warzone API requests", ["endpoint"]
+)
+DB_METRICS = OperationMetrics("db_query", "SQLite queries", ["operation"])
+SHEETS_METRICS = OperationMetrics(
+    "sheets_request", "Google Sheets API requests", ["method"]
+)
+DISCORD_METRICS = OperationMetrics(
+    "discord_request", "Discord message sends and edits", ["action"]
+)
+RTL_TICK_METRICS = OperationMetrics("rtl_engine_tick", "RTL engine ticks", [])
+# from a send being requested to it being delivered, including the wait behind other sends to the same route
+DISCORD_DELIVERY_LATENCY = HistogramFamily(
+    "discord_delivery_latency_seconds",
+    "Latency of Discord message deliveries",
+    ["route"],
+)
+
+
+def render_operation_metrics() -> List[str]:
+    lines = []
+    for metrics in [
+        WARZONE_API_METRICS,
+        DB_METRICS,
+        SHEETS_METRICS,
+        DISCORD_METRICS,
+        RTL_TICK_METRICS,
+        DISCORD_DELIVERY_LATENCY,
+    ]:
+        lines.extend(metrics.render())
+    return lines
+
+
+class MetricsServer:
+    """
+    Serves the bot's metrics in the Prometheus text format at http://host:port/metrics.
+
+    Each collector returns the exposition lines of a group of metrics, and is called on every scrape.
+    """
+
+    def __init__(self, host: str, port: int):
+        self.host = host
+        self.port = port
+        self.collectors: List[Callable[[], List[str]]] = []
+        self.runner: web.AppRunner | None = None
+
+    def add_collector(self, collector: Callable[[], List[str]]):
+        self.collectors.append(collector)
+
+    def render(self) -> str:
+        lines = []
+        for collector in self.collectors:
+            lines.extend(collector())
+        return "\n".join(lines) + "\n"
+
+    async def handle_metrics(self, request: web.Request) -> web.Response:
+        return web.Response(text=self.render(), content_type="text/plain")
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_get("/metrics", self.handle_metrics)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        await web.TCPSite(self.runner, self.host, self.port).start()
+        log_message(
+            f"Serving metrics on http://{self.host}:{self.port}/metrics", "metrics"
+        )
+
+    async def close(self):
+        if self.runner:
+            await self.runner.cleanup()
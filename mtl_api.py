@@ -0,0 +1,81 @@
+# https://warlight-mtl.com/api/v1.0/players/
+import asyncio
+import time
+from typing import Dict
+
+import aiohttp
+
+
+class CachedResponse:
+
+    def __init__(
+        self, payload: Dict, etag: str | None, last_modified: str | None
+    ) -> None:
+        self.payload = payload
+        self.etag = etag
+        self.last_modified = last_modified
+        self.fetched_at = time.monotonic()
+
+
+class MTLAPI:
+    """
+    Async client for the warlight-mtl.com API, sharing one aiohttp session across requests.
+
+    Responses are cached in memory for `ttl` seconds. Once stale, they are revalidated with If-None-Match/If-Modified-Since,
+    so unchanged upstream data costs a 304 instead of the full payload.
+    """
+
+    PLAYERS_ENDPOINT = "https://warlight-mtl.com/api/v1.0/players/?topk=10"
+    GAMES_ENDPOINT = "https://warlight-mtl.com/api/v1.0/games/?topk=10"
+
+    def __init__(self, request_timeout: float = 30, ttl: float = 300):
+        self.request_timeout = request_timeout
+        self.ttl = ttl
+        self.session: aiohttp.ClientSession | None = None
+        self.cache: Dict[str, CachedResponse] = {}
+        # one lock per URL so concurrent callers share a single in-flight request
+        self.locks: Dict[str, asyncio.Lock] = {}
+
+    def get_session(self) -> aiohttp.ClientSession:
+        if self.session is None or self.session.closed:
+            self.session = aiohttp.ClientSession(
+                # warlight-mtl.com's certificate does not verify
+                connector=aiohttp.TCPConnector(ssl=False),
+                timeout=aiohttp.ClientTimeout(total=self.request_timeout),
+            )
+        return self.session
+
+    async def close(self):
+        if self.session is not None and not self.session.closed:
+            await self.session.close()
+
+    async def get(self, url: str) -> Dict:
+        async with self.locks.setdefault(url, asyncio.Lock()):
+            cached = self.cache.get(url)
+            if cached and time.monotonic() - cached.fetched_at < self.ttl:
+                return cached.payload
+
+            headers = {}
+            if cached and cached.etag:
+                headers["If-None-Match"] = cached.etag
+            if cached and cached.last_modified:
+                headers["If-Modified-Since"] = cached.last_modified
+
+            async with self.get_session().get(url, headers=headers) as response:
+                if cached and response.status == 304:
+                    cached.fetched_at = time.monotonic()
+                    return cached.payload
+                response.raise_for_status()
+                payload = await response.json(content_type=None)
+                self.cache[url] = CachedResponse(
+                    payload,
+                    response.headers.get("ETag"),
+                    response.headers.get("Last-Modified"),
+                )
+                return payload
+
+    async def get_player_data(self) -> Dict:
+        return await self.get(MTLAPI.PLAYERS_ENDPOINT)
+
+    async def get_game_data(self) -> Dict:
+        return await self.get(MTLAPI.GAMES_ENDPOINT)
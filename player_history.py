@@ -0,0 +1,156 @@
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, List, Tuple
+
+from tortoise.expressions import Q
+from tortoise.functions import Count
+
+from database import RTLGameModel, RTLPlayerModel
+
+
+class CachedPlayerHistory:
+
+    def __init__(self):
+        # page number -> rendered lines of the page, and whether there is a next page
+        self.pages: Dict[int, Tuple[List[str], bool]] = {}
+        # page number -> (ended, id) of the last game on the page, where the next page starts
+        self.cursors: Dict[int, Tuple[datetime, int]] = {}
+        self.head_to_head: List[str] | None = None
+
+
+class PlayerHistory:
+    """
+    Match history of RTL players, served in pages of `page_size` finished games (most recent first).
+
+    Pages use keyset pagination on (ended, id): each page reads at most `page_size + 1` games from each of the
+    (player_a, ended) and (player_b, ended) indexes, however far back it is. Only the cursors of pages already visited are
+    known, so the first request for page n walks every page before it.
+    Rendered pages, the page cursors and head-to-head records are kept per player in an LRU of `max_cached_players` players.
+    `invalidate` must be called whenever a player finishes a game.
+    """
+
+    def __init__(self, page_size: int = 10, max_cached_players: int = 256):
+        self.page_size = page_size
+        self.max_cached_players = max_cached_players
+        self.cache: OrderedDict[int, CachedPlayerHistory] = OrderedDict()
+
+    def get_cached(self, player_id: int) -> CachedPlayerHistory:
+        if player_id in self.cache:
+            self.cache.move_to_end(player_id)
+        else:
+            self.cache[player_id] = CachedPlayerHistory()
+            if len(self.cache) > self.max_cached_players:
+                self.cache.popitem(last=False)
+        return self.cache[player_id]
+
+    def invalidate(self, player_id: int):
+        # requests in flight keep writing to the removed entry, so they cannot repopulate the cache with stale pages
+        self.cache.pop(player_id, None)
+
+    async def query_page(
+        self, player_id: int, cursor: Tuple[datetime, int] | None
+    ) -> List[Tuple[int, datetime, int, int, int]]:
+        # an OR over player_a/player_b makes SQLite merge both indexes and sort every older game of the player, so each
+        # side is read in order from its own (player, ended) index and the two short lists are merged here
+        rows = []
+        for player_field in ["player_a_id", "player_b_id"]:
+            query = RTLGameModel.filter(
+                **{player_field: player_id}, ended__not_isnull=True
+            )
+            if cursor:
+                ended, id = cursor
+                # `ended__lte` bounds the index range, the OR only filters the games ending at the cursor's time
+                query = query.filter(ended__lte=ended).filter(
+                    Q(ended__lt=ended) | Q(id__lt=id)
+                )
+            # one extra row tells whether there is a next page
+            rows.extend(
+                await query.order_by("-ended", "-id")
+                .limit(self.page_size + 1)
+                .values_list("id", "ended", "player_a_id", "player_b_id", "winner_id")
+            )
+        rows.sort(key=lambda row: (row[1], row[0]), reverse=True)
+        return rows[0 : self.page_size + 1]
+
+    async def get_page(self, player_id: int, page: int) -> Tuple[List[str], bool]:
+        """
+        Returns the rendered games of the 1-based page, and whether there is a next page.
+        """
+        cached = self.get_cached(player_id)
+        if page in cached.pages:
+            return cached.pages[page]
+
+        # walk forward from the closest page whose cursor is known
+        current_page = max((p for p in cached.cursors if p < page), default=0)
+        rows = []
+        while current_page < page:
+            rows = await self.query_page(player_id, cached.cursors.get(current_page))
+            current_page += 1
+            if len(rows) > self.page_size:
+                last_id, last_ended = rows[self.page_size - 1][0:2]
+                cached.cursors[current_page] = (last_ended, last_id)
+            elif current_page < page:
+                # the requested page is past the last game
+                return [], False
+
+        has_next = len(rows) > self.page_size
+        rows = rows[0 : self.page_size]
+        opponent_ids = {
+            player_b_id if player_a_id == player_id else player_a_id
+            for _, _, player_a_id, player_b_id, _ in rows
+        }
+        names = dict(
+            await RTLPlayerModel.filter(warzone_id__in=opponent_ids).values_list(
+                "warzone_id", "name"
+            )
+        )
+        lines = []
+        for id, ended, player_a_id, player_b_id, winner_id in rows:
+            opponent_id = player_b_id if player_a_id == player_id else player_a_id
+            lines.append(
+                f"{'WON ' if winner_id == player_id else 'LOST'} vs [{names.get(opponent_id, opponent_id)}](<https://www.warzone.com/Profile?p={opponent_id}>) - [link](https://www.warzone.com/MultiPlayer?GameID={id}) - <t:{int(ended.timestamp())}:d>"
+            )
+        cached.pages[page] = (lines, has_next)
+        return cached.pages[page]
+
+    async def get_head_to_head(self, player_id: int, count: int = 5) -> List[str]:
+        """
+        Returns the rendered records against the `count` opponents the player has played the most.
+        """
+        cached = self.get_cached(player_id)
+        if cached.head_to_head is not None:
+            return cached.head_to_head
+
+        # opponent id -> [wins, losses]
+        records: Dict[int, List[int]] = {}
+        for player_field, opponent_field in [
+            ("player_a_id", "player_b_id"),
+            ("player_b_id", "player_a_id"),
+        ]:
+            rows = (
+                await RTLGameModel.filter(
+                    **{player_field: player_id}, ended__not_isnull=True
+                )
+                .annotate(
+                    games=Count("id"),
+                    wins=Count("id", _filter=Q(winner_id=player_id)),
+                )
+                .group_by(opponent_field)
+                .values_list(opponent_field, "games", "wins")
+            )
+            for opponent_id, games, wins in rows:
+                record = records.setdefault(opponent_id, [0, 0])
+                record[0] += wins
+                record[1] += games - wins
+
+        opponents = sorted(records.items(), key=lambda item: -sum(item[1]))[0:count]
+        names = dict(
+            await RTLPlayerModel.filter(
+                warzone_id__in=[opponent_id for opponent_id, _ in opponents]
+            ).values_list("warzone_id", "name")
+        )
+        cached.head_to_head = [
+            f"[{names.get(opponent_id, opponent_id)}](<https://www.warzone.com/Profile?p={opponent_id}>) {wins}W - {losses}L"
+            for opponent_id, (wins, losses) in opponents
+        ]
+        return cached.head_to_head
@@ -0,0 +1,155 @@
+from collections import deque
+from datetime import datetime, timedelta, timezone
+import heapq
+import time
+from typing import Deque, Dict, Iterable, List, Tuple
+
+from _types import Game, WarzoneGame
+
+
+class GamePollState:
+
+    def __init__(self, game_id: int, interval: float):
+        self.game_id = game_id
+        self.interval = interval
+        self.due_at = 0.0
+        # bumped whenever the game is rescheduled, older heap entries of the game are then ignored
+        self.version = 0
+        self.last_turn = -1
+        self.last_turn_change = time.monotonic()
+
+
+class PollScheduler:
+    """
+    Decides which RTL games to poll, keeping a priority queue (heapq) of games by their next poll time.
+
+    The next poll time of a game follows its state:
+    - in the join lobby: every `lobby_interval` seconds, and right when the lobby expires
+    - in progress and the turn advanced since the last poll: `min_interval`, as games mostly end right after a turn
+    - in progress without a new turn: doubling up to `max_interval`
+    - no new turn for `stale_after` seconds (e.g. a player stopped playing and is waiting to be booted): `stale_interval`
+
+    At most `polls_per_minute` polls are handed out in any 60 second window. Games that are due beyond the budget stay queued
+    and, being the earliest due, are polled first once budget frees up. Times are `time.monotonic()` seconds.
+    """
+
+    def __init__(
+        self,
+        polls_per_minute: int = 120,
+        lobby_interval: float = 20,
+        lobby_timeout: timedelta = timedelta(minutes=5),
+        min_interval: float = 30,
+        max_interval: float = 180,
+        stale_after: float = 1800,
+        stale_interval: float = 600,
+    ):
+        self.polls_per_minute = polls_per_minute
+        self.lobby_interval = lobby_interval
+        self.lobby_timeout = lobby_timeout
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.stale_after = stale_after
+        self.stale_interval = stale_interval
+        self.games: Dict[int, GamePollState] = {}
+        # (due at, version, game id)
+        self.heap: List[Tuple[float, int, int]] = []
+        # times of the polls handed out within the last minute
+        self.recent_polls: Deque[float] = deque()
+
+    def __len__(self) -> int:
+        return len(self.games)
+
+    def schedule(self, game_id: int, due_at: float):
+        state = self.games[game_id]
+        state.due_at = due_at
+        state.version += 1
+        heapq.heappush(self.heap, (due_at, state.version, game_id))
+        # drop stale entries once they dominate the heap
+        if len(self.heap) > 4 * len(self.games) + 64:
+            self.heap = [
+                (state.due_at, state.version, state.game_id)
+                for state in self.games.values()
+            ]
+            heapq.heapify(self.heap)
+
+    def add(self, game_id: int, delay: float = 0, now: float | None = None):
+        now = time.monotonic() if now is None else now
+        self.games[game_id] = GamePollState(game_id, self.lobby_interval)
+        self.schedule(game_id, now + delay)
+
+    def remove(self, game_id: int):
+        # its heap entries are skipped once the game is gone
+        self.games.pop(game_id, None)
+
+    def sync(self, game_ids: Iterable[int], now: float | None = None):
+        """
+        Tracks exactly the given games: unknown games (e.g. after a restart) are due right away, missing games are removed.
+        """
+        game_ids = set(game_ids)
+        for game_id in list(self.games):
+            if game_id not in game_ids:
+                self.remove(game_id)
+        for game_id in game_ids:
+            if game_id not in self.games:
+                self.add(game_id, now=now)
+
+    def get_budget(self, now: float) -> int:
+        while self.recent_polls and now - self.recent_polls[0] >= 60:
+            self.recent_polls.popleft()
+        return self.polls_per_minute - len(self.recent_polls)
+
+    def pop_due(self, now: float | None = None) -> List[int]:
+        """
+        Returns the due games within the remaining budget, earliest due first.
+
+        Each returned game is provisionally rescheduled after its current interval, in case no result is recorded for it.
+        """
+        now = time.monotonic() if now is None else now
+        budget = self.get_budget(now)
+        due_game_ids = []
+        while self.heap and self.heap[0][0] <= now and len(due_game_ids) < budget:
+            _, version, game_id = heapq.heappop(self.heap)
+            state = self.games.get(game_id)
+            if state is None or state.version != version:
+                continue
+            due_game_ids.append(game_id)
+            self.recent_polls.append(now)
+            self.schedule(game_id, now + state.interval)
+        return due_game_ids
+
+    def record_poll(
+        self, game_id: int, warzone_game: WarzoneGame, now: float | None = None
+    ):
+        """
+        Schedules the next poll of a game that is still going from its polled state.
+        """
+        now = time.monotonic() if now is None else now
+        state = self.games.get(game_id)
+        if state is None:
+            return
+
+        if warzone_game.outcome in [
+            Game.Outcome.WAITING_FOR_PLAYERS,
+            Game.Outcome.DISTRIBUTING_TERRITORIES,
+        ]:
+            state.interval = self.lobby_interval
+            seconds_to_expiry = (
+                warzone_game.start_time
+                + self.lobby_timeout
+                - datetime.now(timezone.utc)
+            ).total_seconds()
+            if 0 < seconds_to_expiry < state.interval:
+                # poll right after the lobby expires so the game is resolved without delay
+                self.schedule(game_id, now + seconds_to_expiry + 1)
+                return
+        elif warzone_game.round != state.last_turn:
+            state.last_turn = warzone_game.round
+            state.last_turn_change = now
+            state.interval = self.min_interval
+        elif now - state.last_turn_change >= self.stale_after:
+            state.interval = self.stale_interval
+        else:
+            state.interval = min(
+                self.max_interval, max(self.min_interval, 2 * state.interval)
+            )
+        self.schedule(game_id, now + state.interval)
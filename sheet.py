@@ -1,13 +1,24 @@
 from __future__ import print_function
 
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from enum import Enum
+import functools
 import os.path
 import re
-from typing import List
+import threading
+import time
+from typing import Callable, Dict, List
 
 from google.oauth2.service_account import Credentials
+from google_auth_httplib2 import AuthorizedHttp
 from googleapiclient.discovery import build, Resource
 from googleapiclient.errors import HttpError
+from googleapiclient.http import HttpRequest
+import httplib2
+
+from metrics import SHEETS_METRICS
+from utils import log_message
 
 SCOPES = ["https://www.googleapis.com/auth/spreadsheets"]
 
@@ -40,6 +51,8 @@ class GoogleSheet:
         # time.
         if os.path.exists("token.json"):
             creds = Credentials.from_service_account_file("token.json", scopes=SCOPES)
+        self.creds = creds
+        self.thread_local = threading.local()
 
         try:
             service: Resource = build("sheets", "v4", credentials=creds)
@@ -54,47 +67,77 @@ class GoogleSheet:
         except HttpError as err:
             print(err)
 
+    def execute(self, request: HttpRequest):
+        """
+        Executes a request using an HTTP connection owned by the calling thread.
+
+        httplib2 connections are not thread-safe, so this allows AsyncGoogleSheet to run requests from a thread pool.
+        """
+        with SHEETS_METRICS.track(getattr(request, "methodId", "unknown")):
+            if self.creds is None:
+                return request.execute()
+            if not hasattr(self.thread_local, "http"):
+                self.thread_local.http = AuthorizedHttp(
+                    self.creds, http=httplib2.Http()
+                )
+            return request.execute(http=self.thread_local.http)
+
     def get_rows(self, range) -> List[List[str]]:
         try:
-            return (
-                self.sheet.values()  # type: ignore
-                .get(spreadsheetId=self.spreadsheet_id, range=range)
-                .execute()["values"]
-            )
+            return self.execute(
+                self.sheet.values().get(  # type: ignore
+                    spreadsheetId=self.spreadsheet_id, range=range
+                )
+            )["values"]
         except:
             return []
 
     def get_rows_formulas(self, range) -> List[List[str]]:
         try:
-            return (
-                self.sheet.values()  # type: ignore
-                .get(
+            return self.execute(
+                self.sheet.values().get(  # type: ignore
                     spreadsheetId=self.spreadsheet_id,
                     range=range,
                     valueRenderOption="FORMULA",
                 )
-                .execute()["values"]
-            )
+            )["values"]
         except:
             return []
 
+    def get_many_ranges(self, ranges: List[str]) -> List[List[List[str]]]:
+        """
+        Reads multiple ranges in a single batchGet request.
+
+        Returns the rows of each range in the same order as the requested ranges.
+        """
+        if not ranges:
+            return []
+        try:
+            value_ranges = self.execute(
+                self.sheet.values().batchGet(  # type: ignore
+                    spreadsheetId=self.spreadsheet_id, ranges=ranges
+                )
+            ).get("valueRanges", [])
+            # Empty ranges are returned without a "values" key
+            return [value_range.get("values", []) for value_range in value_ranges]
+        except:
+            return [[] for _ in ranges]
+
     def update_rows_raw(self, range, data):
         if self.dryrun:
             print("Running dryun on update_rows_raw and not updating sheet")
         else:
-            return (
-                self.sheet.values()  # type: ignore
-                .update(
+            return self.execute(
+                self.sheet.values().update(  # type: ignore
                     spreadsheetId=self.spreadsheet_id,
                     range=range,
                     valueInputOption="USER_ENTERED",
                     body={"values": data},
                 )
-                .execute()
             )
 
     def get_sheet_tabs_data(self):
-        return self.sheet.get(spreadsheetId=self.spreadsheet_id).execute().get("sheets")  # type: ignore
+        return self.execute(self.sheet.get(spreadsheetId=self.spreadsheet_id)).get("sheets")  # type: ignore
 
     def get_game_tabs(self) -> List[str]:
         """
@@ -109,14 +152,77 @@ class GoogleSheet:
                 game_tabs.append(tab["properties"]["title"])
         return game_tabs
 
-    def get_tab_status(self, tab: str) -> TabStatus:
-        tab_status = self.get_rows(f"{tab}!A1")
-
+    @staticmethod
+    def parse_tab_status(tab_status: List[List[str]]) -> TabStatus:
         try:
             return GoogleSheet.TabStatus.from_string(tab_status[0][0])
         except IndexError:
             return GoogleSheet.TabStatus.NOT_STARTED
 
+    def get_tab_status(self, tab: str) -> TabStatus:
+        return GoogleSheet.parse_tab_status(self.get_rows(f"{tab}!A1"))
+
+    def get_tab_statuses(self, tabs: List[str]) -> Dict[str, TabStatus]:
+        """
+        Returns the status of each tab, read with a single request.
+        """
+        tab_statuses = self.get_many_ranges([f"{tab}!A1" for tab in tabs])
+        return {
+            tab: GoogleSheet.parse_tab_status(tab_status)
+            for tab, tab_status in zip(tabs, tab_statuses)
+        }
+
     def get_tabs_by_status(self, status: List["GoogleSheet.TabStatus"]) -> List[str]:
-        tabs = self.get_game_tabs()
-        return [tab for tab in tabs if self.get_tab_status(tab) in status]
+        tab_statuses = self.get_tab_statuses(self.get_game_tabs())
+        return [tab for tab, tab_status in tab_statuses.items() if tab_status in status]
+
+
+class AsyncGoogleSheet:
+    """
+    Async facade over a GoogleSheet for use inside the discord.py event loop.
+
+    The blocking googleapiclient calls run on a dedicated, bounded thread pool so sheet I/O never stalls the Discord gateway.
+    The duration of every call is logged, and each underlying API request is timed in `SHEETS_METRICS`.
+    """
+
+    def __init__(self, sheet: GoogleSheet, max_workers: int = 4):
+        self.sheet = sheet
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="google-sheet"
+        )
+
+    async def run(self, func: Callable, *args):
+        start = time.perf_counter()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(
+                self.executor, functools.partial(func, *args)
+            )
+        finally:
+            duration = time.perf_counter() - start
+            log_message(
+                f"{func.__name__} on {self.sheet.spreadsheet_id} took {duration:.2f}s",
+                "sheet",
+            )
+
+    async def get_rows(self, range) -> List[List[str]]:
+        return await self.run(self.sheet.get_rows, range)
+
+    async def get_rows_formulas(self, range) -> List[List[str]]:
+        return await self.run(self.sheet.get_rows_formulas, range)
+
+    async def get_many_ranges(self, ranges: List[str]) -> List[List[List[str]]]:
+        return await self.run(self.sheet.get_many_ranges, ranges)
+
+    async def update_rows_raw(self, range, data):
+        return await self.run(self.sheet.update_rows_raw, range, data)
+
+    async def get_game_tabs(self) -> List[str]:
+        return await self.run(self.sheet.get_game_tabs)
+
+    async def get_tabs_by_status(
+        self, status: List["GoogleSheet.TabStatus"]
+    ) -> List[str]:
+        return await self.run(self.sheet.get_tabs_by_status, status)
+
+    def close(self):
+        self.executor.shutdown(wait=False)
@@ -1,6 +1,12 @@
+import atexit
 from datetime import datetime
 import json
+import os
+import queue
+import sys
+import threading
 import traceback
+from typing import Dict, List, TextIO, Tuple
 
 import jsonpickle
 
@@ -15,25 +21,119 @@ def write_pickled_file(file_name, data):
         json.dump(jsonpickle.encode(data), file)
 
 
+class LogWriter:
+    """
+    Writes log records to the console and daily JSON-lines files from a background thread.
+
+    Callers only enqueue a record. The writer thread drains the queue in batches, writes each record to
+    `<directory>/<date>.txt` for the date it was logged on, and flushes once per batch, keeping each day's file open
+    until the date changes. Pending records are written when the process exits.
+    """
+
+    # Seconds the writer waits for more records before flushing a partial batch
+    FLUSH_INTERVAL = 0.5
+    MAX_BATCH_SIZE = 1000
+
+    def __init__(self):
+        self.queue: queue.SimpleQueue = queue.SimpleQueue()
+        self.thread: threading.Thread | None = None
+        self.start_lock = threading.Lock()
+        # directory -> (date, open file) of the file currently written to
+        self.files: Dict[str, Tuple[str, TextIO]] = {}
+
+    def start(self):
+        with self.start_lock:
+            if self.thread is None:
+                self.thread = threading.Thread(
+                    target=self.run, name="LogWriter", daemon=True
+                )
+                self.thread.start()
+                atexit.register(self.close)
+
+    def write(self, line: str, record: Dict, directories: List[str]):
+        if self.thread is None:
+            self.start()
+        self.queue.put((line, record, directories))
+
+    def close(self):
+        if self.thread is not None and self.thread.is_alive():
+            # None tells the writer to stop once everything queued before it is written
+            self.queue.put(None)
+            self.thread.join()
+
+    def get_file(self, directory: str, date: str) -> TextIO:
+        if directory in self.files and self.files[directory][0] != date:
+            self.files.pop(directory)[1].close()
+        if directory not in self.files:
+            os.makedirs(directory, exist_ok=True)
+            self.files[directory] = (
+                date,
+                open(os.path.join(directory, f"{date}.txt"), "a", encoding="utf-8"),
+            )
+        return self.files[directory][1]
+
+    def run(self):
+        is_running = True
+        while is_running:
+            try:
+                batch = [self.queue.get(timeout=self.FLUSH_INTERVAL)]
+            except queue.Empty:
+                continue
+            while len(batch) < self.MAX_BATCH_SIZE:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            try:
+                written_files = set()
+                for item in batch:
+                    if item is None:
+                        is_running = False
+                        continue
+                    line, record, directories = item
+                    self.print_line(line)
+                    for directory in directories:
+                        file = self.get_file(directory, record["time"][:10])
+                        file.write(json.dumps(record, ensure_ascii=False) + "\n")
+                        written_files.add(file)
+                for file in written_files:
+                    file.flush()
+            except Exception:
+                # logging must never take the writer down, report the failure and keep going
+                traceback.print_exc()
+
+        for _, file in self.files.values():
+            file.close()
+        self.files = {}
+
+    @staticmethod
+    def print_line(line: str):
+        # consoles that cannot encode a character get an escape sequence instead of an error
+        encoding = sys.stdout.encoding or "utf-8"
+        print(line.encode(encoding, "backslashreplace").decode(encoding))
+
+
+log_writer = LogWriter()
+
+
 def log_message(msg: str, type="FIXME"):
-    output_msg = f"[{datetime.now().isoformat()}] {type}: {msg.encode()}"
-    print(output_msg)
-    with open(
-        "./logs/{}.txt".format(datetime.now().isoformat()[:10]), "a"
-    ) as log_writer:
-        log_writer.write(f"{output_msg}\n")
+    time = datetime.now().isoformat()
+    log_writer.write(
+        f"[{time}] {type}: {msg}",
+        {"time": time, "type": type, "message": str(msg)},
+        ["./logs"],
+    )
 
 
 def log_exception(msg: Exception | str):
-    time_str = "[" + datetime.now().isoformat() + "] {}: ".format(type)
-    print("{}{}\n{}\n".format(time_str, repr(msg).encode(), traceback.format_exc()))
-    with open(
-        "./logs/{}.txt".format(datetime.now().isoformat()[:10]), "a"
-    ) as log_writer:
-        log_writer.write("{}{}\n".format(time_str, repr(msg).encode()))
-    with open(
-        "./errors/{}.txt".format(datetime.now().isoformat()[:10]), "a"
-    ) as log_writer:
-        log_writer.write(
-            "{}{}\n{}\n".format(time_str, repr(msg).encode(), traceback.format_exc())
+    time = datetime.now().isoformat()
+    if isinstance(msg, BaseException) and msg.__traceback__:
+        stack_trace = "".join(
+            traceback.format_exception(type(msg), msg, msg.__traceback__)
         )
+    else:
+        stack_trace = traceback.format_exc()
+    record = {"time": time, "type": "exception", "message": repr(msg)}
+    log_writer.write(f"[{time}] exception: {repr(msg)}", record, ["./logs"])
+    log_writer.write(stack_trace, {**record, "traceback": stack_trace}, ["./errors"])
@@ -1,10 +1,13 @@
 # https://www.warzone.com/wiki/Category:API
 from datetime import datetime, timezone
 from typing import Dict, List, Tuple
+import aiohttp
 import requests
 
 from _types import FullWarzoneGame, Game, WarzoneGame, WarzonePlayer
 from config import Config
+from metrics import WARZONE_API_METRICS
+from rate_limit import TokenBucket
 from utils import log_message
 
 
@@ -25,26 +28,62 @@ class WarzoneAPI:
         self.config = config
         self.dryrun = False
 
-    def check_game(self, game_id: str) -> WarzoneGame:
+    @staticmethod
+    def parse_game(game_json: Dict) -> WarzoneGame:
         """
-        Checks the progress and results of a game using the WZ API.
+        Parses a GameFeed response into a WarzoneGame.
+        """
+        players = []
+        for player in game_json["players"]:
+            players.append(
+                WarzonePlayer(
+                    player["name"],
+                    int(player["id"]),
+                    player["state"],
+                    player.get("team", ""),
+                )
+            )
 
-        Returns the result of the game (in-progress or completed).
+        game = WarzoneGame(
+            players,
+            Game.Outcome(game_json["state"]),
+            f"{WarzoneAPI.GAME_URL}{game_json['id']}",
+            datetime.strptime(game_json["created"], "%m/%d/%Y %H:%M:%S").replace(
+                tzinfo=timezone.utc
+            ),
+            int(game_json["numberOfTurns"]),
+            game_json.get("name", ""),
+        )
+
+        return game
+
+    @staticmethod
+    def parse_full_game(game_json: Dict) -> FullWarzoneGame | None:
         """
-        game_json = requests.post(
-            f"{WarzoneAPI.QUERY_GAME_ENDPOINT}?GameID={game_id}",
-            {"Email": self.config.warzone_email, "APIToken": self.config.warzone_token},
-        ).json()
+        Parses a GameFeed response requested with settings and history into a FullWarzoneGame.
+
+        Returns None if the API responded with an error (eg. the game does not exist).
+        """
+        if "error" in game_json:
+            return None
 
         players = []
         for player in game_json["players"]:
             players.append(
                 WarzonePlayer(
-                    player["name"], int(player["id"]), player["state"], player["team"]
+                    player["name"],
+                    int(player["id"]),
+                    player["state"],
+                    player.get("team", ""),
                 )
             )
 
-        game = WarzoneGame(
+        standings = [
+            game_json[f"standing{i}"]
+            for i in range(0, int(game_json["numberOfTurns"]) + 1)
+        ]
+
+        game = FullWarzoneGame(
             players,
             Game.Outcome(game_json["state"]),
             f"{WarzoneAPI.GAME_URL}{game_json['id']}",
@@ -52,10 +91,66 @@ class WarzoneAPI:
                 tzinfo=timezone.utc
             ),
             int(game_json["numberOfTurns"]),
+            game_json["name"],
+            game_json["settings"]["PersonalMessage"],
+            game_json.get("templateID", 0),
+            game_json["settings"],
+            standings,
+            game_json.get("distributionStanding", {}),
         )
 
         return game
 
+    @staticmethod
+    def parse_template_access(
+        validate_response: Dict, templates: List[str]
+    ) -> Tuple[bool, bool, List[bool]]:
+        """
+        Parses a ValidateInviteToken response into (True if not blacklisted, True if player has access to all templates, List of booleans on access for each template).
+        """
+        if "error" in validate_response:
+            # Probably blacklisted
+            return False, False, []
+        has_access_to_all_templates = True
+        template_access = []
+        for template in templates:
+            has_access_to_all_templates = (
+                has_access_to_all_templates
+                and "CanUseTemplate"
+                in validate_response[f"template{template}"]["result"]
+            )
+            template_access.append(
+                "CanUseTemplate" in validate_response[f"template{template}"]["result"]
+            )
+
+        return True, has_access_to_all_templates, template_access
+
+    def check_game(self, game_id: str) -> WarzoneGame:
+        """
+        Checks the progress and results of a game using the WZ API.
+
+        Returns the result of the game (in-progress or completed).
+        """
+        game_json = requests.post(
+            f"{WarzoneAPI.QUERY_GAME_ENDPOINT}?GameID={game_id}",
+            {"Email": self.config.warzone_email, "APIToken": self.config.warzone_token},
+        ).json()
+
+        return WarzoneAPI.parse_game(game_json)
+
+    def probe_game(self, game_id: str) -> WarzoneGame | None:
+        """
+        Queries only the lightweight GameFeed (no settings or history) of a game.
+
+        Returns None if the game could not be found.
+        """
+        game_json = requests.post(
+            f"{WarzoneAPI.QUERY_GAME_ENDPOINT}?GameID={game_id}",
+            {"Email": self.config.warzone_email, "APIToken": self.config.warzone_token},
+        ).json()
+
+        return None if "error" in game_json else WarzoneAPI.parse_game(game_json)
+
     def get_game_chat(self, game_id: str) -> List[str]:
         """
         Checks the progress and results of a game using the WZ API.
@@ -212,25 +307,10 @@ class WarzoneAPI:
         """
         validate_response = requests.post(
             f"{WarzoneAPI.VALIDATE_INVITE_TOKEN_ENDPOINT}?Token={player_id}&TemplateIDs={','.join(templates)}",
-            {"Email": self.config["email"], "APIToken": self.config["token"]},
+            {"Email": self.config.warzone_email, "APIToken": self.config.warzone_token},
         ).json()
 
-        if "error" in validate_response:
-            # Probably blacklisted
-            return False, False, []
-        has_access_to_all_templates = True
-        template_access = []
-        for template in templates:
-            has_access_to_all_templates = (
-                has_access_to_all_templates
-                and "CanUseTemplate"
-                in validate_response[f"template{template}"]["result"]
-            )
-            template_access.append(
-                "CanUseTemplate" in validate_response[f"template{template}"]["result"]
-            )
-
-        return True, has_access_to_all_templates, template_access
+        return WarzoneAPI.parse_template_access(validate_response, templates)
 
     def validate_player(self, player_id: str) -> Dict:
         """
@@ -256,39 +336,239 @@ class WarzoneAPI:
             {"Email": self.config.warzone_email, "APIToken": self.config.warzone_token},
         ).json()
 
-        if "error" in game_json:
-            return None
+        return WarzoneAPI.parse_full_game(game_json)
 
-        players = []
-        for player in game_json["players"]:
-            players.append(
-                WarzonePlayer(
-                    player["name"],
-                    int(player["id"]),
-                    player["state"],
-                    player.get("team", ""),
-                )
+
+class AsyncWarzoneAPI:
+    """
+    Non-blocking variant of WarzoneAPI for use inside the discord.py event loop.
+
+    Every request goes through a single pooled aiohttp session, so TLS connections to warzone.com are kept alive and reused across calls.
+    Requests are also throttled by a shared token bucket so concurrent callers stay within the WZ API rate limits.
+    """
+
+    # Conservative defaults; the WZ API does not publish exact limits
+    DEFAULT_REQUESTS_PER_SECOND = 5
+    DEFAULT_REQUEST_BURST = 10
+
+    GameCreationException = WarzoneAPI.GameCreationException
+    GameDeletionException = WarzoneAPI.GameDeletionException
+
+    def __init__(
+        self,
+        config: Config,
+        connection_limit: int = 20,
+        connection_limit_per_host: int = 10,
+        keepalive_timeout: float = 60,
+        request_timeout: float = 30,
+        rate_limiter: TokenBucket | None = None,
+    ):
+        self.config = config
+        self.dryrun = False
+        self.connection_limit = connection_limit
+        self.connection_limit_per_host = connection_limit_per_host
+        self.keepalive_timeout = keepalive_timeout
+        self.request_timeout = request_timeout
+        self.session: aiohttp.ClientSession | None = None
+        self.rate_limiter = rate_limiter or TokenBucket(
+            AsyncWarzoneAPI.DEFAULT_REQUESTS_PER_SECOND,
+            AsyncWarzoneAPI.DEFAULT_REQUEST_BURST,
+        )
+
+    def get_session(self) -> aiohttp.ClientSession:
+        """
+        Returns the shared session, creating it on first use.
+
+        The session is created lazily since aiohttp requires a running event loop.
+        """
+        if self.session is None or self.session.closed:
+            self.session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(
+                    limit=self.connection_limit,
+                    limit_per_host=self.connection_limit_per_host,
+                    keepalive_timeout=self.keepalive_timeout,
+                ),
+                timeout=aiohttp.ClientTimeout(total=self.request_timeout),
             )
+        return self.session
+
+    async def close(self):
+        if self.session is not None and not self.session.closed:
+            await self.session.close()
+
+    async def post(self, url: str, data: Dict | None = None, json: Dict | None = None):
+        await self.rate_limiter.acquire()
+        # time the request itself, not the wait for the rate limiter
+        with WARZONE_API_METRICS.track(url.split("?")[0].rsplit("/", 1)[-1]):
+            async with self.get_session().post(url, data=data, json=json) as response:
+                # The WZ API does not always respond with a JSON content type
+                return await response.json(content_type=None)
+
+    def get_auth_data(self) -> Dict:
+        return {
+            "Email": self.config.warzone_email,
+            "APIToken": self.config.warzone_token,
+        }
 
-        standings = [
-            game_json[f"standing{i}"]
-            for i in range(0, int(game_json["numberOfTurns"]) + 1)
-        ]
+    async def check_game(self, game_id: str) -> WarzoneGame:
+        """
+        Checks the progress and results of a game using the WZ API.
 
-        game = FullWarzoneGame(
-            players,
-            Game.Outcome(game_json["state"]),
-            f"{WarzoneAPI.GAME_URL}{game_json['id']}",
-            datetime.strptime(game_json["created"], "%m/%d/%Y %H:%M:%S").replace(
-                tzinfo=timezone.utc
-            ),
-            int(game_json["numberOfTurns"]),
-            game_json["name"],
-            game_json["settings"]["PersonalMessage"],
-            game_json.get("templateID", 0),
-            game_json["settings"],
-            standings,
-            game_json.get("distributionStanding", {}),
+        Returns the result of the game (in-progress or completed).
+        """
+        game_json = await self.post(
+            f"{WarzoneAPI.QUERY_GAME_ENDPOINT}?GameID={game_id}",
+            data=self.get_auth_data(),
         )
 
-        return game
+        return WarzoneAPI.parse_game(game_json)
+
+    async def probe_game(self, game_id: str) -> WarzoneGame | None:
+        """
+        Queries only the lightweight GameFeed (no settings or history) of a game.
+
+        Returns None if the game could not be found.
+        """
+        game_json = await self.post(
+            f"{WarzoneAPI.QUERY_GAME_ENDPOINT}?GameID={game_id}",
+            data=self.get_auth_data(),
+        )
+
+        return None if "error" in game_json else WarzoneAPI.parse_game(game_json)
+
+    async def get_game_chat(self, game_id: str) -> List[str]:
+        """
+        Returns the chat messages of a game using the WZ API.
+        """
+        game_json = await self.post(
+            f"{WarzoneAPI.QUERY_GAME_ENDPOINT}?GameID={game_id}&GetChat=true",
+            data=self.get_auth_data(),
+        )
+
+        return game_json["chat"] if "chat" in game_json else []
+
+    async def create_game(
+        self,
+        players: List[Tuple[str, str]],
+        template: str,
+        name: str,
+        description: str,
+    ) -> str:
+        """
+        Creates a game using the WZ API with the specified players, template, and game name/description.
+
+        Returns the game ID if successfully created, else raises a GameCreationException.
+        """
+        data = {
+            "hostEmail": self.config.warzone_email,
+            "hostAPIToken": self.config.warzone_token,
+            "templateID": int(template),
+            "gameName": name,
+            "personalMessage": description,
+            "players": [{"token": str(e[0]), "team": e[1]} for e in players],
+        }
+        if self.dryrun:
+            print("Running dryrun on game creation")
+            game_response = {"gameID": 25876586}
+            print(f"{name}\n{description}\n{data['players']}\n\n")
+        else:
+            game_response = await self.post(WarzoneAPI.CREATE_GAME_ENDPOINT, json=data)
+
+        if "error" in game_response:
+            raise WarzoneAPI.GameCreationException(game_response["error"])
+        else:
+            return game_response["gameID"]
+
+    async def create_custom_scenario_game(
+        self,
+        players: List[Tuple[str, str]],
+        name: str,
+        description: str,
+        settings: Dict,
+    ) -> str:
+        """
+        Creates a game using the WZ API with the specified players, settings and game name/description.
+
+        Returns the game ID if successfully created, else raises a GameCreationException.
+        """
+        settings["AutomaticTerritoryDistribution"] = "Automatic"
+        settings["DistributionMode"] = -3
+        settings["PersonalMessage"] = description
+        data = {
+            "hostEmail": self.config.warzone_email,
+            "hostAPIToken": self.config.warzone_token,
+            "gameName": name,
+            "personalMessage": description,
+            "players": [{"token": e[0], "slot": e[1]} for e in players],
+            "settings": settings,
+        }
+        if self.dryrun:
+            print("Running dryrun on game creation")
+            game_response = {"gameID": 25876586}
+            print(f"{name}\n{description}\n{data['players']}\n\n")
+        else:
+            game_response = await self.post(WarzoneAPI.CREATE_GAME_ENDPOINT, json=data)
+
+        if "error" in game_response:
+            raise WarzoneAPI.GameCreationException(game_response["error"])
+        else:
+            return game_response["gameID"]
+
+    async def delete_game(self, game_id: int):
+        """
+        Deletes a warzone game if a player did not join in time.
+
+        Returns None if successful, otherwise raises a GameDeletionException
+        """
+        if self.dryrun:
+            print("Running dryrun on game deletion")
+            game_response = {}
+        else:
+            game_response = await self.post(
+                WarzoneAPI.DELETE_GAME_ENDPOINT,
+                json={
+                    "Email": self.config.warzone_email,
+                    "APIToken": self.config.warzone_token,
+                    "gameID": game_id,
+                },
+            )
+
+        if "error" in game_response:
+            raise WarzoneAPI.GameDeletionException(f"Unable to delete game {game_id}")
+
+    async def validate_player_template_access(
+        self, player_id: str, templates: List[str]
+    ) -> Tuple[bool, bool, List[bool]]:
+        """
+        Checks if the player has access to the list of templates.
+
+        Returns a tuple containing (True if not blacklisted, True if player has access to all templates, List of booleans on access for each template).
+        """
+        validate_response = await self.post(
+            f"{WarzoneAPI.VALIDATE_INVITE_TOKEN_ENDPOINT}?Token={player_id}&TemplateIDs={','.join(templates)}",
+            data=self.get_auth_data(),
+        )
+
+        return WarzoneAPI.parse_template_access(validate_response, templates)
+
+    async def validate_player(self, player_id: str) -> Dict:
+        """
+        Returns the raw ValidateInviteToken response for the player.
+        """
+        return await self.post(
+            f"{WarzoneAPI.VALIDATE_INVITE_TOKEN_ENDPOINT}?Token={player_id}",
+            data=self.get_auth_data(),
+        )
+
+    async def query_game_full(self, game_id: str) -> FullWarzoneGame | None:
+        """
+        Queries a game including its settings and full turn history using the WZ API.
+
+        Returns None if the game could not be found.
+        """
+        game_json = await self.post(
+            f"{WarzoneAPI.QUERY_GAME_ENDPOINT}?GameID={game_id}&getsettings=true&gethistory=true",
+            data=self.get_auth_data(),
+        )
+
+        return WarzoneAPI.parse_full_game(game_json)